@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django import forms
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.urls import path
-import pandas as pd
-from .models import Year, Board, SubjectStat
+from .models import Year, Board, SubjectStat, BulkJob
+from .mark_grids import mark_grid_dir, materialize_mark_grids
+from .stats import invalidate_stats, invalidate_year_choices
+from .subjects import canonical_subject
 import logging
 import traceback
 
@@ -13,6 +16,15 @@ class YearAdmin(admin.ModelAdmin):
     list_display = ('value',)
     search_fields = ('value',)
     ordering = ('-value',)
+    actions = ['precompute_mark_grids']
+
+    @admin.action(description="Precompute normalized marks for the selected years")
+    def precompute_mark_grids(self, request, queryset):
+        if not mark_grid_dir():
+            self.message_user(request, "KEAM_MARK_GRID_DIR is not set; grids are disabled", level='warning')
+            return
+        written = materialize_mark_grids(queryset.values_list('id', flat=True))
+        self.message_user(request, f"Precomputed normalized marks for {written} years", level='success')
 
 class BoardAdmin(admin.ModelAdmin):
     list_display = ('name', 'year')
@@ -25,6 +37,107 @@ class BoardAdmin(admin.ModelAdmin):
         form.base_fields['year'].queryset = Year.objects.all().order_by('-value')
         return form
 
+def import_subject_stats(df):
+    """Upsert SubjectStat rows from a stats sheet with set-based queries.
+
+    ``df`` must already have the standard year/board/subject/mean/sd columns.
+    Rows are validated first, then years, boards and existing stats are
+    resolved in bulk and the changes applied with bulk_create/bulk_update in
+    one transaction. Returns ``(counts, errors)`` where counts has
+    created/updated/skipped (unchanged) totals.
+    """
+    counts = {'created': 0, 'updated': 0, 'skipped': 0}
+    errors = []
+    records = []
+
+    for index, year_raw, board_raw, subject_raw, mean_raw, sd_raw in zip(
+            df.index, df['year'], df['board'], df['subject'], df['mean'], df['sd']):
+        try:
+            year_val = int(str(year_raw).strip())
+            board_name = str(board_raw).strip()
+            subject = str(subject_raw).strip().title()
+            mean = float(str(mean_raw).strip())
+            sd = float(str(sd_raw).strip())
+        except Exception as e:
+            errors.append((index, f"Row {index + 2}: {str(e)}"))
+            continue
+
+        if sd <= 0:
+            errors.append((index, f"Row {index + 2}: SD must be positive (was {sd})"))
+            continue
+        if year_val < 0:
+            errors.append((index, f"Row {index + 2}: Year must be positive (was {year_val})"))
+            continue
+
+        records.append((index, year_val, board_name, subject, mean, sd))
+
+    if not records:
+        return counts, [message for _, message in errors]
+
+    with transaction.atomic():
+        year_values = {record[1] for record in records}
+        existing_years = set(Year.objects.filter(value__in=year_values).values_list('value', flat=True))
+        new_years = Year.objects.bulk_create([Year(value=value) for value in sorted(year_values - existing_years)])
+        years = dict(Year.objects.filter(value__in=year_values).values_list('value', 'id'))
+
+        board_keys = {(record[2], years[record[1]]) for record in records}
+        board_names = {name for name, _ in board_keys}
+        boards = {
+            (board.name, board.year_id): board
+            for board in Board.objects.filter(year_id__in=years.values(), name__in=board_names)
+        }
+        Board.objects.bulk_create([
+            Board(name=name, year_id=year_id)
+            for name, year_id in sorted(board_keys - boards.keys())
+        ])
+        boards = {
+            (board.name, board.year_id): board
+            for board in Board.objects.filter(year_id__in=years.values(), name__in=board_names)
+        }
+
+        existing = {
+            (stat.board_id, stat.subject_key): stat
+            for stat in SubjectStat.objects.filter(board__in=boards.values())
+        }
+
+        to_create = {}
+        to_update = {}
+        for index, year_val, board_name, subject, mean, sd in records:
+            board = boards[(board_name, years[year_val])]
+            subject_key = canonical_subject(subject)
+            key = (board.pk, subject_key)
+
+            if key in to_create:
+                to_create[key].mean, to_create[key].sd = mean, sd
+                counts['updated'] += 1
+            elif key in existing:
+                stat = existing[key]
+                if stat.mean == mean and stat.sd == sd and key not in to_update:
+                    counts['skipped'] += 1
+                else:
+                    stat.mean, stat.sd = mean, sd
+                    to_update[key] = stat
+                    counts['updated'] += 1
+            else:
+                # bulk_create skips save(), so the key is set here
+                to_create[key] = SubjectStat(
+                    board=board, subject=subject, subject_key=subject_key, mean=mean, sd=sd
+                )
+                counts['created'] += 1
+
+        SubjectStat.objects.bulk_create(to_create.values(), batch_size=500)
+        SubjectStat.objects.bulk_update(to_update.values(), ['mean', 'sd'], batch_size=500)
+
+        # bulk_create/bulk_update bypass the model signals. The stats
+        # generations must move in the same transaction as the stats
+        invalidate_stats(*years.values())
+
+    if new_years:
+        invalidate_year_choices()
+    errors.sort(key=lambda error: error[0])
+    return counts, [message for _, message in errors]
+
+
 class UploadStatsForm(forms.Form):
     stats_file = forms.FileField(label="Upload Excel or CSV File")
 
@@ -52,6 +165,8 @@ class SubjectStatAdmin(admin.ModelAdmin):
             if form.is_valid():
                 file = request.FILES['stats_file']
                 try:
+                    import pandas as pd  # Only admin imports need it
+
                     if file.name.endswith('.csv'):
                         df = pd.read_csv(
                             file,
@@ -88,45 +203,24 @@ class SubjectStatAdmin(admin.ModelAdmin):
                         )
                         return redirect("..")
 
-                    success_count = 0
-                    errors = []
-
-                    for index, row in df.iterrows():
-                        try:
-                            year_val = int(str(row['year']).strip())
-                            board_name = str(row['board']).strip()
-                            subject = str(row['subject']).strip().title()
-                            mean = float(str(row['mean']).strip())
-                            sd = float(str(row['sd']).strip())
-
-                            if sd <= 0:
-                                errors.append(f"Row {index + 2}: SD must be positive (was {sd})")
-                                continue
-
-                            year_obj, _ = Year.objects.get_or_create(value=year_val)
-                            board_obj, _ = Board.objects.get_or_create(
-                                name=board_name,
-                                year=year_obj,
-                                defaults={'name': board_name, 'year': year_obj}
-                            )
-
-                            _, created = SubjectStat.objects.update_or_create(
-                                board=board_obj,
-                                subject__iexact=subject,
-                                defaults={'mean': mean, 'sd': sd}
-                            )
-
-                            success_count += 1
-                            action = "Created" if created else "Updated"
-                            logger.info(f"{action} stats for {board_name} - {subject} ({year_val})")
-
-                        except Exception as e:
-                            error_msg = f"Row {index + 2}: {str(e)}"
-                            errors.append(error_msg)
-                            logger.error(error_msg)
+                    counts, errors = import_subject_stats(df)
+                    if counts['created'] or counts['updated']:
+                        year_values = pd.to_numeric(df['year'], errors='coerce').dropna().astype(int).unique()
+                        materialize_mark_grids(
+                            Year.objects.filter(value__in=year_values.tolist()).values_list('id', flat=True)
+                        )
+                    success_count = counts['created'] + counts['updated'] + counts['skipped']
+                    logger.info(
+                        f"Stats import: {counts['created']} created, {counts['updated']} updated, "
+                        f"{counts['skipped']} unchanged, {len(errors)} errors"
+                    )
 
                     if success_count:
-                        msg = f"Successfully processed {success_count} records"
+                        msg = (
+                            f"Successfully processed {success_count} records "
+                            f"({counts['created']} created, {counts['updated']} updated, "
+                            f"{counts['skipped']} unchanged)"
+                        )
                         level = 'success'
                     else:
                         msg = "No records processed"
@@ -160,6 +254,14 @@ class SubjectStatAdmin(admin.ModelAdmin):
             "opts": self.model._meta,
         })
 
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'year', 'status', 'rows_processed', 'rows_errored', 'created_at', 'finished_at')
+    list_filter = ('status', 'year')
+    readonly_fields = (
+        'rows_processed', 'rows_errored', 'error', 'unknown_boards', 'created_at', 'started_at', 'finished_at'
+    )
+
 # Register the models
 admin.site.register(Year, YearAdmin)
-admin.site.register(Board, BoardAdmin)
\ No newline at end of file
+admin.site.register(Board, BoardAdmin)
+admin.site.register(BulkJob, BulkJobAdmin)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import json
+import logging
+import math
+
+import numpy as np
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .models import Year
+from .normalization import SUBJECTS, DEFAULT_STAT, normalize_students
+from .stats import KERALA_BOARD_NAME, gather_board_stats, get_stats_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 10000
+
+
+def _to_finite(value):
+    try:
+        value = float(value)
+    except (ValueError, TypeError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _parse_student(student):
+    """Validate one {year, board, maths, physics, chemistry, entrance} object"""
+    if not isinstance(student, dict):
+        return None, ["Expected an object"]
+
+    errors = []
+    try:
+        year_value = int(student.get('year'))
+    except (ValueError, TypeError):
+        year_value = None
+        errors.append("year must be an integer")
+
+    board_name = str(student.get('board') or '').strip()
+    if not board_name:
+        errors.append("board is required")
+
+    marks = {}
+    for view_subject in SUBJECTS:
+        if student.get(view_subject) in (None, ''):
+            errors.append(f"{view_subject} is required")
+            continue
+        mark = _to_finite(student[view_subject])
+        if mark is None:
+            errors.append(f"{view_subject} must be a number")
+        marks[view_subject] = mark
+
+    entrance = student.get('entrance')
+    entrance = _to_finite(entrance) if entrance not in (None, '') else 0.0
+    if entrance is None:
+        errors.append("entrance must be a number")
+
+    if errors:
+        return None, errors
+    return {'year': year_value, 'board': board_name, 'marks': marks, 'entrance': entrance}, []
+
+
+def _normalize_year_group(stats_index, students):
+    """Normalize students of one year together; returns (result, errors) per student"""
+    outcomes = [None] * len(students)
+    kerala_stats = {}
+    kerala_errors = []
+    for view_subject in SUBJECTS:
+        stat = stats_index.get(KERALA_BOARD_NAME, view_subject)
+        kerala_stats[view_subject] = stat or DEFAULT_STAT
+        if not stat:
+            kerala_errors.append(f"No Kerala HSE stats for {view_subject} - using default values")
+
+    positions = []
+    for position, student in enumerate(students):
+        if not stats_index.has_board(student['board']):
+            outcomes[position] = (None, [f"Unknown board {student['board']!r} for {student['year']}"])
+        else:
+            positions.append(position)
+    if not positions:
+        return outcomes
+
+    known = [students[position] for position in positions]
+    marks = {
+        view_subject: np.array([student['marks'][view_subject] for student in known])
+        for view_subject in SUBJECTS
+    }
+    entrance = np.array([student['entrance'] for student in known])
+
+    _, board_stats, fallback = gather_board_stats(stats_index, [student['board'] for student in known])
+    stat_errors = [list(kerala_errors) for _ in known]
+    for view_subject in SUBJECTS:
+        for row in np.flatnonzero(fallback[view_subject]):
+            stat_errors[row].append(
+                f"No {known[row]['board']} stats for {view_subject} - using fallback values"
+            )
+
+    subject_columns, scaled_total, final_score = normalize_students(
+        marks, board_stats, kerala_stats, entrance
+    )
+    subject_columns = {
+        view_subject: {key: values.tolist() for key, values in columns.items()}
+        for view_subject, columns in subject_columns.items()
+    }
+    scaled_total = scaled_total.tolist()
+    final_score = final_score.tolist()
+
+    for row, (position, student) in enumerate(zip(positions, known)):
+        normalized = {}
+        for view_subject, columns in subject_columns.items():
+            norm_data = {key: values[row] for key, values in columns.items()}
+            norm_data['board_name'] = student['board']
+            normalized[view_subject] = norm_data
+
+        outcomes[position] = ({
+            'normalized': normalized,
+            'scaled_total': scaled_total[row],
+            'final_score': final_score[row],
+            'original': {**student['marks'], 'entrance': student['entrance']},
+        }, stat_errors[row])
+    return outcomes
+
+
+def normalize_payload(students):
+    """Normalize a list of student objects; returns one {result, errors} per student"""
+    outcomes = [None] * len(students)
+    groups = {}
+    for position, student in enumerate(students):
+        parsed, errors = _parse_student(student)
+        if parsed is None:
+            outcomes[position] = (None, errors)
+        else:
+            groups.setdefault(parsed['year'], []).append((position, parsed))
+
+    years = dict(Year.objects.filter(value__in=groups).values_list('value', 'id'))
+    for year_value, members in groups.items():
+        if year_value not in years:
+            for position, _ in members:
+                outcomes[position] = (None, [f"No statistics for year {year_value}"])
+            continue
+
+        stats_index = get_stats_index(years[year_value])
+        group_outcomes = _normalize_year_group(stats_index, [parsed for _, parsed in members])
+        for (position, _), outcome in zip(members, group_outcomes):
+            outcomes[position] = outcome
+
+    return [{'result': result, 'errors': errors} for result, errors in outcomes]
+
+
+def _load_json(request):
+    try:
+        return json.loads(request.body), None
+    except (ValueError, UnicodeDecodeError):
+        return None, JsonResponse({'error': 'Request body must be valid JSON'}, status=400)
+
+
+@csrf_exempt
+@require_POST
+def normalize_api(request):
+    """Normalize one student's marks"""
+    student, error_response = _load_json(request)
+    if error_response:
+        return error_response
+
+    outcome = normalize_payload([student])[0]
+    return JsonResponse(outcome, status=200 if outcome['result'] else 400)
+
+
+@csrf_exempt
+@require_POST
+def normalize_batch_api(request):
+    """Normalize an array of students (or {"students": [...]}) in one call"""
+    payload, error_response = _load_json(request)
+    if error_response:
+        return error_response
+
+    students = payload.get('students') if isinstance(payload, dict) else payload
+    if not isinstance(students, list):
+        return JsonResponse({'error': 'Expected an array of students'}, status=400)
+
+    max_batch = getattr(settings, 'KEAM_API_MAX_BATCH', DEFAULT_MAX_BATCH)
+    if len(students) > max_batch:
+        return JsonResponse({'error': f'At most {max_batch} students per call'}, status=400)
+
+    return JsonResponse({'results': normalize_payload(students)})
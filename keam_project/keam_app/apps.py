@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class KeamAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'keam_app'
+
+    def ready(self):
+        from . import db, signals  # noqa: F401
+        from .snapshot import load_stats_snapshot
+
+        load_stats_snapshot()
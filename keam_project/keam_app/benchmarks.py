@@ -0,0 +1,244 @@
+import logging
+import random
+import threading
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .admin import import_subject_stats
+from .bulk import read_mark_sheet, normalize_mark_sheet
+from .bulk_results import expand
+from .models import Year, Board
+from .stats import KERALA_BOARD_NAME
+from .subjects import SUBJECT_NAME_MAPPING
+
+FIRST_YEAR = 2000
+
+
+def generate_stats_rows(years, boards, seed=0):
+    """Synthetic stats sheet rows: years x (Kerala HSE + boards) x subjects"""
+    rng = random.Random(seed)
+    board_names = [KERALA_BOARD_NAME] + [f"Board {number:03d}" for number in range(boards)]
+    rows = []
+    for year in range(FIRST_YEAR, FIRST_YEAR + years):
+        for board_name in board_names:
+            for subject in SUBJECT_NAME_MAPPING.values():
+                rows.append({
+                    'year': year,
+                    'board': board_name,
+                    'subject': subject,
+                    'mean': round(rng.uniform(50, 85), 4),
+                    'sd': round(rng.uniform(5, 20), 4),
+                })
+    return rows
+
+
+def generate_mark_sheet(rows, boards, seed=0, unknown_ratio=0.01):
+    """Synthetic student CSV with marks for ``boards`` boards and a few unknown ones"""
+    rng = random.Random(seed)
+    lines = ["Board,Maths,Physics,Chemistry,Entrance"]
+    for _ in range(rows):
+        if rng.random() < unknown_ratio:
+            board_name = f"Unknown {rng.randrange(5)}"
+        else:
+            board_name = f"Board {rng.randrange(boards):03d}"
+        lines.append(
+            f"{board_name},{rng.uniform(0, 100):.2f},{rng.uniform(0, 100):.2f},"
+            f"{rng.uniform(0, 100):.2f},{rng.uniform(0, 300):.2f}"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(operation, repeat, items=1):
+    """Time ``operation`` ``repeat`` times, then rerun it once under tracemalloc.
+
+    One untimed warm-up run comes first so one-off costs (template loading,
+    cache fills) do not skew the latencies. Returns throughput (items/s),
+    p50/p99 latency, DB queries and peak Python heap of a single run.
+    """
+    operation()
+
+    latencies = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - start)
+        queries = len(captured)
+
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'items': items,
+        'repeat': repeat,
+        'throughput_per_s': items * len(latencies) / sum(latencies),
+        'p50_ms': _percentile(latencies, 0.5) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'queries': queries,
+        'peak_memory_mb': peak / (1024 * 1024),
+    }
+
+
+def load_stats(years, boards, seed=0):
+    import pandas as pd
+
+    counts, errors = import_subject_stats(pd.DataFrame(generate_stats_rows(years, boards, seed)))
+    if errors:
+        raise RuntimeError(f"Synthetic stats failed to import: {errors[:3]}")
+    return Year.objects.get(value=FIRST_YEAR)
+
+
+def bench_admin_import(years, boards, repeat):
+    import pandas as pd
+
+    seeds = iter(range(1, repeat + 3))
+    frame_rows = len(generate_stats_rows(years, boards))
+
+    def run():
+        # A new seed changes every mean/sd, so each run is a full update
+        import_subject_stats(pd.DataFrame(generate_stats_rows(years, boards, next(seeds))))
+
+    return measure(run, repeat, items=frame_rows)
+
+
+def _client_for(year):
+    client = Client()
+    client.post('/select-year/', {'year': year.id})
+    return client
+
+
+def bench_year_selection(year, mode, threads, visitors):
+    """New visitors picking a year and opening the marks form from ``threads``
+    threads at once, with the selection kept in ``mode`` ('cookie' or 'session').
+
+    Counts the write statements the flow issues and the requests that failed
+    on a locked database.
+    """
+    writes = []
+    failures = []
+    latencies = []
+    lock = threading.Lock()
+
+    def count_writes(execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            with lock:
+                writes.append(sql)
+        return execute(sql, params, many, context)
+
+    def visit(count):
+        try:
+            with connection.execute_wrapper(count_writes):
+                for _ in range(count):
+                    client = Client()
+                    start = time.perf_counter()
+                    try:
+                        client.post('/select-year/', {'year': year.id})
+                        client.get('/marks-form/')
+                    except DatabaseError as exc:
+                        with lock:
+                            failures.append(str(exc))
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    # Locked requests are expected in session mode; counted rather than logged
+    request_logger = logging.getLogger('django.request')
+    with override_settings(KEAM_YEAR_SELECTION=mode):
+        request_logger.disabled = True
+        try:
+            _client_for(year).get('/marks-form/')  # warm the stats and fragment caches
+            workers = [threading.Thread(target=visit, args=(visitors // threads,)) for _ in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            request_logger.disabled = False
+
+    return {
+        'mode': mode,
+        'threads': threads,
+        'visitors': len(latencies),
+        'visitors_per_s': len(latencies) / elapsed,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'writes': len(writes),
+        'lock_failures': len(failures),
+    }
+
+
+def bench_result(year, repeat):
+    client = _client_for(year)
+    board_ids = list(Board.objects.filter(year=year).exclude(name=KERALA_BOARD_NAME).values_list('id', flat=True))
+    rng = random.Random(0)
+
+    def run():
+        response = client.post('/result/', {
+            'board': rng.choice(board_ids),
+            'maths': round(rng.uniform(0, 100), 2),
+            'physics': round(rng.uniform(0, 100), 2),
+            'chemistry': round(rng.uniform(0, 100), 2),
+            'entrance': round(rng.uniform(0, 300), 2),
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"result returned {response.status_code}")
+
+    return measure(run, repeat)
+
+
+def bench_bulk_upload(year, rows, boards, repeat):
+    client = _client_for(year)
+    content = generate_mark_sheet(rows, boards)
+
+    def run():
+        response = client.post('/upload/', {
+            'marks_file': SimpleUploadedFile("marks.csv", content), 'format': 'csv'
+        })
+        for _ in response.streaming_content:
+            pass
+
+    return measure(run, repeat, items=rows)
+
+
+def bulk_row_footprint(year, rows, boards):
+    """Heap retained per row when a whole normalized sheet is kept in memory,
+    as compact results and expanded to plain dicts"""
+    content = generate_mark_sheet(rows, boards)
+
+    def retained(materialize):
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            kept = materialize(normalize_mark_sheet(
+                read_mark_sheet(SimpleUploadedFile("marks.csv", content)), year
+            ))
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del kept
+        return (after - before) / rows
+
+    return {
+        'rows': rows,
+        'compact_bytes_per_row': retained(list),
+        'expanded_bytes_per_row': retained(
+            lambda results: [(row_number, expand(result), errors) for row_number, result, errors in results]
+        ),
+    }
@@ -0,0 +1,222 @@
+import difflib
+import logging
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .bulk_results import BulkResult, ResultBlock
+from .mark_grids import get_mark_grid
+from .normalization import SUBJECTS, DEFAULT_STAT
+from .parallel import normalize_students_parallel, parallel_enabled, parallel_min_rows
+from .stats import KERALA_BOARD_NAME, gather_board_stats, get_stats_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Closest known board names offered for an unknown one
+MAX_BOARD_SUGGESTIONS = 3
+
+
+def _chunk_size():
+    chunk_size = getattr(settings, 'KEAM_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    if parallel_enabled():
+        # Chunks must be large enough to be worth splitting across workers
+        return max(chunk_size, parallel_min_rows())
+    return chunk_size
+
+
+def _iter_xlsx_chunks(file, chunk_size):
+    """Read the first sheet row by row with openpyxl's read-only mode"""
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [
+            str(name) if name is not None else f"Unnamed: {position}"
+            for position, name in enumerate(header)
+        ]
+
+        index, chunk = [], []
+        for sheet_row, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            # Keep "Row N" messages pointing at the spreadsheet row
+            index.append(sheet_row - 2)
+            chunk.append(values[:len(columns)])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=index)
+                index, chunk = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def read_mark_sheet(file, chunk_size=None):
+    """Yield an uploaded CSV/XLSX mark sheet as DataFrames of bounded size.
+
+    Row indexes keep counting across chunks so ``index + 2`` is always the
+    spreadsheet row number.
+    """
+    chunk_size = chunk_size or _chunk_size()
+    if file.name.endswith('.xlsx'):
+        chunks = _iter_xlsx_chunks(file, chunk_size)
+    else:
+        import pandas as pd
+        chunks = pd.read_csv(file, chunksize=chunk_size)
+
+    for df in chunks:
+        df.columns = df.columns.str.strip()
+        yield df
+
+
+def _board_column(df):
+    """Stripped board names per row; blank when the sheet has no Board column or cell"""
+    if 'Board' not in df.columns:
+        return [''] * len(df)
+    return df['Board'].fillna('').astype(str).str.strip().tolist()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def _mark_column(df, names):
+    """Float marks per row taken from the first non-empty column in ``names``"""
+    import pandas as pd
+    values = pd.Series(0, index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            column = df[name].astype(object)
+            values = column.where(column.map(bool), values)
+    return np.array(values.map(_to_float).tolist(), dtype=np.float64)
+
+
+class UnknownBoards:
+    """Board names of an upload that the year has no stats for, with row counts"""
+
+    def __init__(self):
+        self.rows = Counter()
+        self._known = {}  # lowercased name -> board name
+        self._suggestions = {}
+
+    def add_known_boards(self, board_names):
+        self._known.update((board_name.lower(), board_name) for board_name in board_names)
+        self._suggestions.clear()
+
+    def add(self, board_name, rows):
+        self.rows[board_name] += rows
+
+    def suggestions(self, board_name):
+        """Closest known board names, matched case-insensitively"""
+        if board_name not in self._suggestions:
+            matches = difflib.get_close_matches(
+                board_name.lower(), self._known, n=MAX_BOARD_SUGGESTIONS
+            )
+            self._suggestions[board_name] = [self._known[match] for match in matches]
+        return self._suggestions[board_name]
+
+    def error(self, board_name):
+        suggestions = self.suggestions(board_name)
+        if suggestions:
+            return f"Unknown board {board_name!r} (did you mean {' or '.join(map(repr, suggestions))}?)"
+        return f"Unknown board {board_name!r}"
+
+    def summary(self):
+        """One entry per unknown board, most affected rows first"""
+        return [
+            {'board': board_name, 'rows': rows, 'suggestions': self.suggestions(board_name)}
+            for board_name, rows in self.rows.most_common()
+        ]
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def _normalize_chunk(df, stats_index, kerala_stats, unknown_boards, mark_grid=None):
+    board_names = _board_column(df)
+    entrance = _mark_column(df, ['Entrance'])
+    marks = {
+        view_subject: _mark_column(df, [view_subject.capitalize(), view_subject, view_subject.upper()])
+        for view_subject in SUBJECTS
+    }
+
+    # Stats are resolved per distinct board and gathered into row columns by code
+    board_codes, board_stats, missing_stats = gather_board_stats(stats_index, board_names)
+
+    # Errors depend only on the board, so they are worked out once per board.
+    # Unknown boards are reported, never created: uploads stay read-only
+    errors_by_code = []
+    first_rows = np.unique(board_codes, return_index=True)[1].tolist()
+    board_rows = np.bincount(board_codes).tolist()
+    for board_name, first_row, rows in zip(dict.fromkeys(board_names), first_rows, board_rows):
+        if not board_name:
+            errors_by_code.append(["Missing board name"])
+        elif not stats_index.has_board(board_name):
+            unknown_boards.add(board_name, rows)
+            errors_by_code.append([unknown_boards.error(board_name)])
+        else:
+            errors_by_code.append([
+                f"No stats for {view_subject}"
+                for view_subject in SUBJECTS
+                if missing_stats[view_subject][first_row]
+            ])
+
+    normalized = None
+    if mark_grid is not None:
+        grid_rows = mark_grid.board_rows(dict.fromkeys(board_names))[board_codes]
+        normalized = {
+            view_subject: mark_grid.lookup(view_subject, grid_rows, marks[view_subject])
+            for view_subject in SUBJECTS
+        }
+
+    subject_columns, scaled_total, final_score = normalize_students_parallel(
+        marks, board_stats, kerala_stats, entrance, board_codes, normalized
+    )
+    for view_subject in SUBJECTS:
+        subject_columns[view_subject]['stats_fallback'] = missing_stats[view_subject]
+
+    row_errors = [errors_by_code[code] for code in board_codes.tolist()]
+    block = ResultBlock(board_names, marks, entrance, scaled_total, final_score, subject_columns, row_errors)
+
+    for position, (index, board_name) in enumerate(zip(df.index, board_names)):
+        if not board_name:
+            yield index + 2, None, list(row_errors[position])
+        else:
+            yield index + 2, BulkResult(block, position), list(row_errors[position])
+
+
+def normalize_mark_sheet(chunks, year, unknown_boards=None):
+    """Normalize mark sheet chunks against a year's stats, one row at a time.
+
+    Yields ``(row_number, result, row_errors)`` in sheet order; ``result`` is
+    None for rows that could not be normalized at all. Only one chunk's
+    arrays are alive at a time, so memory stays flat for any file size.
+
+    Nothing is written to the database. Rows of boards the year does not
+    know are normalized with the fallback stats and tallied in
+    ``unknown_boards`` (an UnknownBoards) when one is passed.
+    """
+    stats_index = get_stats_index(year)
+    if unknown_boards is None:
+        unknown_boards = UnknownBoards()
+    unknown_boards.add_known_boards(stats_index.boards)
+
+    kerala_stats = {
+        view_subject: stats_index.get(KERALA_BOARD_NAME, view_subject, DEFAULT_STAT)
+        for view_subject in SUBJECTS
+    }
+
+    mark_grid = get_mark_grid(stats_index)
+    for df in chunks:
+        yield from _normalize_chunk(df, stats_index, kerala_stats, unknown_boards, mark_grid)
@@ -0,0 +1,132 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from .normalization import SUBJECTS
+
+# Per-subject columns, in the order normalize_marks returns them
+SUBJECT_KEYS = (
+    'student_mark', 'mean_source', 'sd_source', 'z_score', 'percentile',
+    'z_kerala', 'mean_kerala', 'sd_kerala', 'normalized_mark',
+)
+
+RANK_KEYS = ('rank', 'percentile_rank', 'tied_with')
+
+# Columns of a ResultBlock. Everything is stored as float64 so a row is
+# one contiguous record: flags as 0/1, counts as whole numbers and unset
+# rank fields as NaN
+FIELDS = (
+    SUBJECTS
+    + ('entrance', 'scaled_total', 'final_score')
+    + RANK_KEYS
+    + tuple(f'{view_subject}.{key}' for view_subject in SUBJECTS for key in SUBJECT_KEYS)
+    + tuple(f'{view_subject}.stats_fallback' for view_subject in SUBJECTS)
+)
+_FIELD = {name: position for position, name in enumerate(FIELDS)}
+_INTEGER_FIELDS = {_FIELD['rank'], _FIELD['tied_with']}
+
+
+class ResultBlock:
+    """Normalized results of one chunk of rows as a single 2-D float array.
+
+    A row costs len(FIELDS) * 8 bytes, against kilobytes for the nested
+    dicts it expands to; board names and error lists are shared between
+    rows.
+    """
+
+    __slots__ = ('values', 'boards', 'errors', 'ranked')
+
+    def __init__(self, boards, marks, entrance, scaled_total, final_score, subject_columns, errors):
+        self.values = np.empty((len(boards), len(FIELDS)))
+        self.boards = boards
+        self.errors = errors
+        self.ranked = False
+
+        for view_subject in SUBJECTS:
+            self.values[:, _FIELD[view_subject]] = marks[view_subject]
+            for key, column in subject_columns[view_subject].items():
+                self.values[:, _FIELD[f'{view_subject}.{key}']] = column
+        self.values[:, _FIELD['entrance']] = entrance
+        self.values[:, _FIELD['scaled_total']] = scaled_total
+        self.values[:, _FIELD['final_score']] = final_score
+        for key in RANK_KEYS:
+            self.values[:, _FIELD[key]] = np.nan
+
+    def __len__(self):
+        return len(self.boards)
+
+
+class BulkResult(Mapping):
+    """Read-only view of one row of a ResultBlock with the bulk result dict shape.
+
+    Nested values (marks, subject_results) are built only when a template
+    or export asks for them. Rank fields are the only writable keys.
+    """
+
+    __slots__ = ('_block', '_position')
+
+    def __init__(self, block, position):
+        self._block = block
+        self._position = position
+
+    def _record(self):
+        return self._block.values[self._position].tolist()
+
+    def _keys(self):
+        keys = ('board', 'marks', 'entrance', 'scaled_total', 'final_score', 'subject_results', 'errors')
+        return keys + RANK_KEYS if self._block.ranked else keys
+
+    def _value(self, key, record):
+        if key == 'board':
+            return self._block.boards[self._position]
+        if key == 'errors':
+            return list(self._block.errors[self._position])
+        if key == 'marks':
+            return {view_subject: record[_FIELD[view_subject]] for view_subject in SUBJECTS}
+        if key == 'subject_results':
+            subject_results = {}
+            for view_subject in SUBJECTS:
+                norm_data = {field: record[_FIELD[f'{view_subject}.{field}']] for field in SUBJECT_KEYS}
+                norm_data['stats_fallback'] = bool(record[_FIELD[f'{view_subject}.stats_fallback']])
+                subject_results[view_subject] = norm_data
+            return subject_results
+        value = record[_FIELD[key]]
+        if key in RANK_KEYS:
+            if value != value:
+                return None
+            return int(value) if _FIELD[key] in _INTEGER_FIELDS else value
+        return value
+
+    def __getitem__(self, key):
+        if key not in self._keys():
+            raise KeyError(key)
+        return self._value(key, self._record())
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __setitem__(self, key, value):
+        if key not in RANK_KEYS:
+            raise KeyError(f"{key!r} is read-only")
+        self._block.ranked = True
+        self._block.values[self._position, _FIELD[key]] = np.nan if value is None else value
+
+    def update(self, **values):
+        for key, value in values.items():
+            self[key] = value
+
+    def to_dict(self):
+        """Expand into the plain nested dict shape"""
+        record = self._record()
+        return {key: self._value(key, record) for key in self._keys()}
+
+    def __repr__(self):
+        return f"BulkResult({self.to_dict()!r})"
+
+
+def expand(result):
+    """Plain dict for a bulk result, expanding a BulkResult in one pass"""
+    return result.to_dict() if isinstance(result, BulkResult) else result
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import functools
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',  # readers keep reading while an import writes
+    'synchronous': 'normal',  # safe with WAL; fsync at checkpoints only
+    'busy_timeout': 5000,  # ms a writer waits for the lock before failing
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+_public_reads = contextvars.ContextVar('keam_public_reads', default=False)
+
+
+def read_database():
+    """Alias public pages read from; None sends them to 'default'"""
+    return getattr(settings, 'KEAM_READ_DATABASE', None)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply DEFAULT_SQLITE_PRAGMAS to every new SQLite connection.
+
+    Connections to the read alias are also made query_only, so a stray
+    write through them fails instead of taking the writer lock.
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in DEFAULT_SQLITE_PRAGMAS.items():
+            if name == 'journal_mode' and connection.is_in_memory_db():
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if connection.alias == read_database():
+            cursor.execute("PRAGMA query_only = ON")
+
+
+def public_reads(view):
+    """Route the view's ORM reads to the read-only database alias"""
+
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _public_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _public_reads.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _public_reads.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _public_reads.reset(token)
+    return wrapper
+
+
+class PublicReadRouter:
+    """Send reads made inside ``public_reads`` views to KEAM_READ_DATABASE.
+
+    Writes always go to 'default'. An in-memory read alias (the test
+    database) cannot be a separate reader, so reads stay on 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_database()
+        if not alias or not _public_reads.get() or alias not in connections:
+            return None
+        if connections[alias].vendor == 'sqlite' and connections[alias].is_in_memory_db():
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != read_database()
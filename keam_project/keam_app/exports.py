@@ -0,0 +1,164 @@
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from .bulk_results import RANK_KEYS, expand
+from .normalization import SUBJECTS
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'keam_results.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'keam_results.xlsx'),
+}
+
+# Rows written between flushes of the XLSX stream
+XLSX_FLUSH_ROWS = 500
+
+
+def export_header(ranked=False):
+    header = ['Row', 'Board', 'Maths', 'Physics', 'Chemistry', 'Entrance']
+    for view_subject in SUBJECTS:
+        label = view_subject.capitalize()
+        header += [f'{label} Z-Score', f'{label} Percentile', f'{label} Normalized']
+    header += ['Scaled Total', 'Final Score']
+    if ranked:
+        header += ['Rank', 'Percentile Rank', 'Tied With']
+    return header + ['Errors']
+
+
+def export_row(row_number, result, row_errors, ranked=False):
+    """Flatten one normalized row into export columns"""
+    errors = "; ".join(row_errors)
+    if result is None:
+        return [row_number] + [''] * (len(export_header(ranked)) - 2) + [errors]
+
+    result = expand(result)
+    row = [row_number, result['board']]
+    marks = result['marks']
+    row += [marks[view_subject] for view_subject in SUBJECTS]
+    row.append(result['entrance'])
+    subject_results = result['subject_results']
+    for view_subject in SUBJECTS:
+        norm_data = subject_results[view_subject]
+        row += [norm_data['z_score'], norm_data['percentile'], norm_data['normalized_mark']]
+    row += [result['scaled_total'], result['final_score']]
+    if ranked:
+        row += ['' if result[key] is None else result[key] for key in RANK_KEYS]
+    return row + [errors]
+
+
+class _Echo:
+    """File-like object that hands back whatever is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_export(rows, ranked=False):
+    """Yield CSV lines for ``(row_number, result, row_errors)`` tuples as they arrive"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export_header(ranked))
+    for row_number, result, row_errors in rows:
+        yield writer.writerow(export_row(row_number, result, row_errors, ranked))
+
+
+class _StreamBuffer:
+    """Write-only, non-seekable sink that zipfile streams into"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Results" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+    if value != value or value in (float('inf'), float('-inf')):
+        return '<c/>'  # NaN/inf have no spreadsheet representation
+    return f'<c><v>{value!r}</v></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode()
+
+
+def iter_xlsx_export(rows, ranked=False):
+    """Yield an XLSX workbook in pieces while rows are still being normalized.
+
+    openpyxl only produces bytes on save, so the worksheet XML is written
+    straight into a deflated zip entry and flushed every XLSX_FLUSH_ROWS rows.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield buffer.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(export_header(ranked)))
+            for count, (row_number, result, row_errors) in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(export_row(row_number, result, row_errors, ranked)))
+                if count % XLSX_FLUSH_ROWS == 0:
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def iter_export(rows, export_format, ranked=False):
+    if export_format == 'xlsx':
+        return iter_xlsx_export(rows, ranked)
+    return iter_csv_export(rows, ranked)
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+
+def write_atomically(path, write):
+    """Replace ``path`` with what ``write(output)`` writes to a binary file.
+
+    The data goes to a temporary file in the same directory (created if
+    needed) that is renamed over ``path``, so readers see either the old
+    file or the complete new one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            write(output)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
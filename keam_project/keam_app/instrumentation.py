@@ -0,0 +1,228 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, Http404
+
+_current = contextvars.ContextVar('keam_instrumentation', default=None)
+
+_METRICS = (
+    ('requests_total', 'counter', "Requests handled"),
+    ('request_seconds_total', 'counter', "Wall time spent in the view"),
+    ('db_queries_total', 'counter', "Database queries executed"),
+    ('db_seconds_total', 'counter', "Time spent in database queries"),
+    ('normalize_seconds_total', 'counter', "Time spent normalizing marks"),
+    ('rows_processed_total', 'counter', "Students normalized"),
+)
+
+_totals = {}  # view name -> {metric: value}
+_totals_lock = threading.Lock()
+
+
+def instrumentation_enabled():
+    return getattr(settings, 'KEAM_INSTRUMENTATION', False)
+
+
+class Recording:
+    """Timings of one request, filled in while it is the active recording"""
+
+    def __init__(self, view_name=None):
+        self.view_name = view_name
+        self.wall = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.normalize_seconds = 0.0
+        self.rows = 0
+
+    @contextlib.contextmanager
+    def active(self):
+        token = _current.set(self)
+        install_query_recorder()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall += time.perf_counter() - start
+            _current.reset(token)
+
+    def server_timing(self):
+        return ", ".join([
+            f"total;dur={self.wall * 1000:.2f}",
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries"',
+            f'normalize;dur={self.normalize_seconds * 1000:.2f};desc="{self.rows} rows"',
+        ])
+
+    def publish(self):
+        with _totals_lock:
+            totals = _totals.setdefault(self.view_name, dict.fromkeys(name for name, _, _ in _METRICS))
+            for name, value in (
+                ('requests_total', 1),
+                ('request_seconds_total', self.wall),
+                ('db_queries_total', self.db_queries),
+                ('db_seconds_total', self.db_seconds),
+                ('normalize_seconds_total', self.normalize_seconds),
+                ('rows_processed_total', self.rows),
+            ):
+                totals[name] = (totals[name] or 0) + value
+
+
+def _record_query(execute, sql, params, many, context):
+    recording = _current.get()
+    if recording is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recording.db_seconds += time.perf_counter() - start
+        recording.db_queries += 1
+
+
+def install_query_recorder():
+    """Charge this thread's queries, on every alias, to the active recording.
+
+    Connections are per thread and async views query from sync_to_async
+    threads, so the recorder stays installed and looks the recording up in
+    the (copied) context instead of being wrapped around one request.
+    """
+    for connection in connections.all():
+        if _record_query not in connection.execute_wrappers:
+            # First, so execute_wrapper() blocks still pop their own wrapper
+            connection.execute_wrappers.insert(0, _record_query)
+
+
+@contextlib.contextmanager
+def track_normalization():
+    """Charge the enclosed normalization work to the active request, if any"""
+    recording = _current.get()
+    if recording is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recording.normalize_seconds += time.perf_counter() - start
+
+
+def add_rows(count):
+    recording = _current.get()
+    if recording is not None:
+        recording.rows += count
+
+
+class InstrumentationMiddleware:
+    """Per-view wall time, DB queries and normalization time.
+
+    Disabled unless KEAM_INSTRUMENTATION is set, in which case Django drops
+    the middleware at startup and requests pay nothing for it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recording = Recording()
+        with recording.active():
+            response = self.get_response(request)
+        return self._finish(request, recording, response)
+
+    async def __acall__(self, request):
+        recording = Recording()
+        with recording.active():
+            # The view's queries run on the request's sync_to_async thread
+            await sync_to_async(install_query_recorder)()
+            response = await self.get_response(request)
+        return self._finish(request, recording, response)
+
+    def _finish(self, request, recording, response):
+        match = getattr(request, 'resolver_match', None)
+        recording.view_name = (match.view_name if match else None) or 'unresolved'
+
+        response['Server-Timing'] = recording.server_timing()
+        if response.streaming:
+            # Bulk exports normalize while streaming; keep charging that work
+            stream = self._astream if response.is_async else self._stream
+            response.streaming_content = stream(recording, response.streaming_content)
+        else:
+            recording.publish()
+        return response
+
+    @staticmethod
+    def _stream(recording, content):
+        iterator = iter(content)
+        try:
+            while True:
+                with recording.active():
+                    chunk = next(iterator, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            recording.publish()
+
+    @staticmethod
+    async def _astream(recording, content):
+        # Chunks are produced in worker threads under ASGI, so only their wall time is seen here
+        iterator = aiter(content)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    recording.wall += time.perf_counter() - start
+                yield chunk
+        finally:
+            recording.publish()
+
+
+def render_metrics():
+    """Prometheus text exposition of the totals collected by this process"""
+    from .result_cache import get_result_cache
+    from .stats import stats_cache_info
+
+    with _totals_lock:
+        totals = {view: dict(values) for view, values in _totals.items()}
+
+    lines = []
+    for name, kind, description in _METRICS:
+        lines.append(f"# HELP keam_{name} {description}")
+        lines.append(f"# TYPE keam_{name} {kind}")
+        for view, values in sorted(totals.items()):
+            lines.append(f'keam_{name}{{view="{view}"}} {values[name] or 0}')
+
+    for counter, value in stats_cache_info().items():
+        lines.append(f"# TYPE keam_stats_cache_{counter}_total counter")
+        lines.append(f"keam_stats_cache_{counter}_total {value}")
+
+    for counter, value in get_result_cache().info().items():
+        if counter in ('size', 'max_size'):
+            lines.append(f"# TYPE keam_result_cache_{counter} gauge")
+            lines.append(f"keam_result_cache_{counter} {value}")
+        else:
+            lines.append(f"# TYPE keam_result_cache_{counter}_total counter")
+            lines.append(f"keam_result_cache_{counter}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    if not instrumentation_enabled():
+        raise Http404("Instrumentation is disabled")
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,152 @@
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.core.files import File
+from django.utils import timezone
+
+from .bulk import UnknownBoards, read_mark_sheet, normalize_mark_sheet
+from .exports import EXPORT_FORMATS, iter_export
+from .models import BulkJob
+from .ranking import Cohort, rank_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROGRESS_EVERY = 1000
+DEFAULT_JOB_TIMEOUT = 60 * 60  # seconds a job may run before another worker takes it over
+DEFAULT_JOB_RETENTION = 60 * 60 * 24 * 7  # seconds finished jobs and their files are kept
+
+
+def submit_bulk_job(year, upload, export_format='csv'):
+    """Store an uploaded mark sheet and queue it for the bulk worker"""
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+    job = BulkJob(year=year, export_format=export_format)
+    job.source_file.save(os.path.basename(upload.name), upload, save=False)
+    job.save()
+    return job
+
+
+def job_timeout():
+    return getattr(settings, 'KEAM_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+
+
+def job_retention():
+    return getattr(settings, 'KEAM_JOB_RETENTION', DEFAULT_JOB_RETENTION)
+
+
+def claim_next_job():
+    """Atomically move the oldest claimable job to running, or return None.
+
+    Pending jobs are claimable, and so are jobs left running for longer
+    than KEAM_JOB_TIMEOUT, whose worker is assumed to have died.
+    """
+    while True:
+        stale_before = timezone.now() - timedelta(seconds=job_timeout())
+        job = (
+            BulkJob.objects
+            .filter(Q(status=BulkJob.PENDING) | Q(status=BulkJob.RUNNING, started_at__lt=stale_before))
+            .order_by('created_at')
+            .values('id', 'status', 'started_at')
+            .first()
+        )
+        if job is None:
+            return None
+
+        # Another worker may have claimed it in between; only one UPDATE wins
+        claimed = BulkJob.objects.filter(**job).update(
+            status=BulkJob.RUNNING, started_at=timezone.now(), rows_processed=0, rows_errored=0
+        )
+        if claimed:
+            if job['status'] == BulkJob.RUNNING:
+                logger.warning(f"Reclaimed bulk job {job['id']}, running since {job['started_at']}")
+            return BulkJob.objects.get(id=job['id'])
+
+
+def purge_expired_jobs():
+    """Delete jobs finished more than KEAM_JOB_RETENTION seconds ago, with their files"""
+    expired = BulkJob.objects.filter(
+        status__in=[BulkJob.DONE, BulkJob.FAILED],
+        finished_at__lt=timezone.now() - timedelta(seconds=job_retention()),
+    )
+    purged = 0
+    for job in expired.iterator():
+        for field in (job.source_file, job.result_file, job.cohort_file):
+            if field:
+                field.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
+
+
+def _track_progress(job, rows, progress_every):
+    processed = errored = 0
+    for row_number, result, row_errors in rows:
+        processed += 1
+        if row_errors:
+            errored += 1
+        if processed % progress_every == 0:
+            BulkJob.objects.filter(id=job.id).update(rows_processed=processed, rows_errored=errored)
+        yield row_number, result, row_errors
+
+    job.rows_processed, job.rows_errored = processed, errored
+
+
+def run_bulk_job(job):
+    """Normalize a claimed job's sheet and store the export as its result file"""
+    progress_every = getattr(settings, 'KEAM_JOB_PROGRESS_EVERY', DEFAULT_PROGRESS_EVERY)
+
+    try:
+        with job.source_file.open('rb') as source, tempfile.TemporaryFile() as output:
+            unknown_boards = UnknownBoards()
+            rows = normalize_mark_sheet(read_mark_sheet(source), job.year, unknown_boards)
+            # Ranks need the whole cohort, so the rows are buffered before export
+            rows, cohort = rank_rows(_track_progress(job, rows, progress_every))
+            for data in iter_export(rows, job.export_format, ranked=True):
+                output.write(data.encode() if isinstance(data, str) else data)
+
+            output.seek(0)
+            _, filename = EXPORT_FORMATS[job.export_format]
+            job.result_file.save(f"{job.id}_{filename}", File(output), save=False)
+
+        with tempfile.TemporaryFile() as cohort_output:
+            cohort.save(cohort_output)
+            cohort_output.seek(0)
+            job.cohort_file.save(f"{job.id}_cohort.npy", File(cohort_output), save=False)
+
+        job.unknown_boards = unknown_boards.summary()
+        job.status = BulkJob.DONE
+    except Exception as e:
+        logger.exception(f"Bulk job {job.id} failed")
+        job.refresh_from_db(fields=['rows_processed', 'rows_errored'])
+        job.status = BulkJob.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def job_cohort(job):
+    """The stored cohort of a finished job, or None if it has none"""
+    if job.status != BulkJob.DONE or not job.cohort_file:
+        return None
+    with job.cohort_file.open('rb') as cohort_file:
+        return Cohort.load(cohort_file)
+
+
+def job_progress(job):
+    return {
+        'job_id': str(job.id),
+        'status': job.status,
+        'rows_processed': job.rows_processed,
+        'rows_errored': job.rows_errored,
+        'error': job.error,
+        'unknown_boards': job.unknown_boards,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,71 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so nothing is already imported
+_PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'keam_project.settings')
+if sys.argv[1] == 'wsgi':
+    from keam_project.wsgi import application
+    from django.urls import resolve
+    resolve('/')  # imports the URLconf and views like the first request would
+else:
+    import django
+    from django.core.management import call_command
+    django.setup()
+    call_command('check', verbosity=0)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'pandas': 'pandas' in sys.modules,
+    'scipy': 'scipy' in sys.modules,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure cold import time and peak RSS of the WSGI app and manage.py check"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per target")
+        parser.add_argument('--json', action='store_true', help="Print machine-readable results")
+
+    def handle(self, *args, **options):
+        results = {}
+        for target in ('wsgi', 'check'):
+            samples = [self._probe(target) for _ in range(options['runs'])]
+            results[target] = {
+                'median_seconds': statistics.median(sample['seconds'] for sample in samples),
+                'median_max_rss_mb': statistics.median(sample['max_rss_kb'] for sample in samples) / 1024,
+                'pandas_loaded': samples[0]['pandas'],
+                'scipy_loaded': samples[0]['scipy'],
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for target, result in results.items():
+            self.stdout.write(
+                f"{target:>6}: {result['median_seconds'] * 1000:.0f} ms, "
+                f"{result['median_max_rss_mb']:.1f} MB max RSS, "
+                f"pandas {'loaded' if result['pandas_loaded'] else 'not loaded'}, "
+                f"scipy {'loaded' if result['scipy_loaded'] else 'not loaded'}"
+            )
+
+    def _probe(self, target):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE, target],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(output.stdout.strip().splitlines()[-1])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from keam_app.snapshot import export_stats_snapshot, snapshot_path
+
+
+class Command(BaseCommand):
+    help = "Export every year's board statistics to the memory-mapped stats snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Snapshot file (default: KEAM_STATS_SNAPSHOT)")
+
+    def handle(self, *args, **options):
+        path = options['output'] or snapshot_path()
+        if not path:
+            raise CommandError("Set KEAM_STATS_SNAPSHOT or pass --output")
+
+        years, rows = export_stats_snapshot(path)
+        self.stdout.write(f"Wrote {rows} stats rows for {years} years to {path}")
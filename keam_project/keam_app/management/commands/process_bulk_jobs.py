@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from keam_app.jobs import claim_next_job, purge_expired_jobs, run_bulk_job
+
+
+class Command(BaseCommand):
+    help = "Run queued bulk normalization jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between queue polls")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                purged = purge_expired_jobs()
+                if purged:
+                    self.stdout.write(f"Removed {purged} expired jobs and their files")
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f"Processing {job}")
+            job = run_bulk_job(job)
+            self.stdout.write(
+                f"{job}: {job.rows_processed} rows, {job.rows_errored} with errors"
+            )
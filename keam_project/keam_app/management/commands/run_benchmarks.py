@@ -0,0 +1,125 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment, setup_databases, \
+    teardown_databases
+
+from keam_app import benchmarks
+from keam_app.result_cache import get_result_cache
+from keam_app.year_selection import COOKIE, SESSION
+
+PATHS = ('admin_import', 'result', 'bulk_upload', 'year_selection')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark the result, bulk upload and admin import paths on synthetic data in a test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=3, help="Synthetic years of stats")
+        parser.add_argument('--boards', type=int, default=40, help="Synthetic boards per year")
+        parser.add_argument('--rows', default='1000,10000,100000', help="Comma-separated bulk upload sizes")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark")
+        parser.add_argument('--result-repeat', type=int, default=200, help="Timed single-result requests")
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent visitors for year_selection")
+        parser.add_argument('--visitors', type=int, default=400, help="New visitors for year_selection")
+        parser.add_argument('--paths', default=','.join(PATHS), help="Comma-separated subset of " + ", ".join(PATHS))
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--compare', help="Previous JSON report to print relative changes against")
+
+    def handle(self, *args, **options):
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        unknown = set(paths) - set(PATHS)
+        if unknown:
+            self.stderr.write(f"Unknown paths: {', '.join(sorted(unknown))}")
+            return
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = {
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'parameters': {
+                    key: options[key] for key in ('years', 'boards', 'rows', 'repeat', 'result_repeat', 'threads', 'visitors')
+                },
+            }
+            report['results'], report['memory'], report['contention'] = self._run(paths, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self._print(report, options.get('compare'))
+        if options.get('output'):
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def _run(self, paths, options):
+        caches[getattr(settings, 'KEAM_STATS_CACHE_ALIAS', 'default')].clear()
+        get_result_cache().clear()
+        year = benchmarks.load_stats(options['years'], options['boards'])
+        results, memory, contention = {}, {}, {}
+
+        if 'admin_import' in paths:
+            results['admin_import'] = benchmarks.bench_admin_import(
+                options['years'], options['boards'], options['repeat']
+            )
+        if 'result' in paths:
+            results['result'] = benchmarks.bench_result(year, options['result_repeat'])
+        if 'bulk_upload' in paths:
+            for rows in (int(size) for size in options['rows'].split(',') if size.strip()):
+                results[f'bulk_upload_{rows}'] = benchmarks.bench_bulk_upload(
+                    year, rows, options['boards'], options['repeat']
+                )
+                memory[f'bulk_rows_{rows}'] = benchmarks.bulk_row_footprint(year, rows, options['boards'])
+        if 'year_selection' in paths:
+            for mode in (SESSION, COOKIE):
+                contention[f'year_selection_{mode}'] = benchmarks.bench_year_selection(
+                    year, mode, options['threads'], options['visitors']
+                )
+        return results, memory, contention
+
+    def _print(self, report, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path) as compare_file:
+                previous = json.load(compare_file).get('results', {})
+
+        self.stdout.write(f"commit {report['commit']}, python {report['python']}")
+        self.stdout.write(
+            f"{'benchmark':<20}{'items/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak MB':>9}"
+        )
+        for name, result in report['results'].items():
+            line = (
+                f"{name:<20}{result['throughput_per_s']:>12.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['queries']:>9}{result['peak_memory_mb']:>9.2f}"
+            )
+            if name in previous:
+                change = result['throughput_per_s'] / previous[name]['throughput_per_s'] - 1
+                line += f"  ({change:+.0%} throughput vs {compare_path})"
+            self.stdout.write(line)
+
+        for name, footprint in report.get('memory', {}).items():
+            self.stdout.write(
+                f"{name:<20}{footprint['compact_bytes_per_row']:>8.0f} B/row retained "
+                f"({footprint['expanded_bytes_per_row']:.0f} B/row as dicts)"
+            )
+
+        for name, run in report.get('contention', {}).items():
+            self.stdout.write(
+                f"{name:<24}{run['visitors_per_s']:>8.1f} visitors/s  p99 {run['p99_ms']:.1f} ms  "
+                f"{run['writes']} writes  {run['lock_failures']} locked  ({run['threads']} threads)"
+            )
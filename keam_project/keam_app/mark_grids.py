@@ -0,0 +1,187 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .files import write_atomically
+from .normalization import SUBJECTS, DEFAULT_STAT, normalize_marks
+from .stats import KERALA_BOARD_NAME, get_stats_index
+
+logger = logging.getLogger(__name__)
+
+# The marks form accepts 0-100 in steps of 0.01
+GRID_SCALE = 100  # grid points per mark
+GRID_MAX = 100
+GRID_MARKS = np.arange(GRID_MAX * GRID_SCALE + 1) / GRID_SCALE
+
+# Seconds before a year whose grid was missing is looked for on disk again,
+# unless KEAM_MARK_GRID_RECHECK_INTERVAL says otherwise
+DEFAULT_GRID_RECHECK_INTERVAL = 60
+
+_loaded = {}  # year id -> MarkGrid
+_missing = {}  # year id -> (version, time.monotonic() of the failed lookup)
+_loaded_lock = threading.Lock()
+
+
+def mark_grid_dir():
+    """Directory holding materialized grids; None turns grids off"""
+    return getattr(settings, 'KEAM_MARK_GRID_DIR', None)
+
+
+def _recheck_interval():
+    return getattr(settings, 'KEAM_MARK_GRID_RECHECK_INTERVAL', DEFAULT_GRID_RECHECK_INTERVAL)
+
+
+class MarkGrid:
+    """Normalized marks of one year's stats at every mark on the form's grid.
+
+    ``normalized`` has one plane per subject, holding one row per board plus
+    a last row for DEFAULT_STAT (boards without stats for a subject, unknown
+    boards) and one column per grid mark. The year's Kerala HSE stats are
+    part of its version, so a lookup is the final normalized mark. Marks off
+    the grid are reported as NaN and normalized exactly.
+
+    Saved grids are memory-mapped read-only, so workers share their pages
+    and only the rows that are looked up are read from disk.
+    """
+
+    def __init__(self, year_id, version, board_names, normalized):
+        self.year_id = year_id
+        self.version = version
+        self.board_names = list(board_names)
+        self.normalized = normalized
+        self._rows = {board_name: row for row, board_name in enumerate(self.board_names)}
+
+    @classmethod
+    def build(cls, stats_index):
+        board_names = sorted(stats_index.boards)
+        normalized = np.empty((len(SUBJECTS), len(board_names) + 1, GRID_MARKS.size))
+        for plane, view_subject in enumerate(SUBJECTS):
+            stats = [stats_index.get(board_name, view_subject, DEFAULT_STAT) for board_name in board_names]
+            means, sds = np.array(stats + [DEFAULT_STAT]).T
+            normalized[plane] = normalize_marks(
+                GRID_MARKS, means[:, None], sds[:, None],
+                *stats_index.get(KERALA_BOARD_NAME, view_subject, DEFAULT_STAT)
+            )['normalized_mark']
+        return cls(stats_index.year_id, stats_index.version, board_names, normalized)
+
+    @property
+    def default_row(self):
+        return len(self.board_names)
+
+    def board_rows(self, board_names):
+        """Grid row of each board name; the DEFAULT_STAT row for boards not in the grid"""
+        return np.array([self._rows.get(board_name, self.default_row) for board_name in board_names], dtype=np.intp)
+
+    def lookup(self, view_subject, board_rows, marks):
+        """Normalized ``marks`` (row-aligned with ``board_rows``), NaN off the grid"""
+        marks = np.asarray(marks, dtype=np.float64)
+        columns = np.rint(marks * GRID_SCALE)
+        # Exactly on the grid: NaN and out-of-range marks fail this too
+        on_grid = columns / GRID_SCALE == marks
+        on_grid &= (columns >= 0) & (columns < GRID_MARKS.size)
+        cells = np.where(on_grid, board_rows * GRID_MARKS.size + columns, 0).astype(np.intp)
+        found = self.normalized[SUBJECTS.index(view_subject)].take(cells)
+        return np.where(on_grid, found, np.nan)
+
+    def normalized_mark(self, board_name, view_subject, mark):
+        """Normalized mark of one raw mark, or None when it is off the grid"""
+        value = self.lookup(view_subject, self.board_rows([board_name]), [mark])[0]
+        return None if np.isnan(value) else value.item()
+
+    def nbytes(self):
+        return self.normalized.nbytes
+
+    def save(self, directory):
+        """Write the grid atomically, replacing older grids of the year.
+
+        The board list is written first and the marks last, so a grid whose
+        marks exist is complete.
+        """
+        path = _grid_path(directory, self.year_id, self.version)
+        write_atomically(_boards_path(path), lambda output: output.write(json.dumps(self.board_names).encode()))
+        write_atomically(path, lambda output: np.save(output, self.normalized))
+
+        for stale in glob.glob(os.path.join(directory, f"year_{self.year_id}_*.npy")):
+            if stale != path:
+                os.unlink(stale)
+                if os.path.exists(_boards_path(stale)):
+                    os.unlink(_boards_path(stale))
+        return path
+
+    @classmethod
+    def load(cls, directory, year_id, version):
+        path = _grid_path(directory, year_id, version)
+        normalized = np.load(path, mmap_mode='r')
+        with open(_boards_path(path)) as boards:
+            board_names = json.load(boards)
+        if normalized.shape != (len(SUBJECTS), len(board_names) + 1, GRID_MARKS.size):
+            raise ValueError(f"{path} does not match its board list")
+        return cls(year_id, version, board_names, normalized)
+
+
+def _grid_path(directory, year_id, version):
+    return os.path.join(directory, f"year_{year_id}_{version}.npy")
+
+
+def _boards_path(grid_path):
+    return os.path.splitext(grid_path)[0] + '.json'
+
+
+def materialize_mark_grids(year_ids):
+    """Build and store the grid of each year; returns how many were written"""
+    directory = mark_grid_dir()
+    if not directory:
+        return 0
+
+    written = 0
+    for year_id in year_ids:
+        grid = MarkGrid.build(get_stats_index(year_id))
+        grid.save(directory)
+        with _loaded_lock:
+            _loaded[year_id] = MarkGrid.load(directory, grid.year_id, grid.version)
+            _missing.pop(year_id, None)
+        written += 1
+        logger.info(
+            f"Materialized mark grid for year {year_id}: {len(grid.board_names)} boards, "
+            f"{grid.nbytes() / (1024 * 1024):.1f} MB"
+        )
+    return written
+
+
+def get_mark_grid(stats_index):
+    """The materialized grid matching ``stats_index``, or None.
+
+    A grid built from other stats (an older version) is never used; callers
+    then normalize exactly until the grid is materialized again. A missing
+    grid is only looked for again after KEAM_MARK_GRID_RECHECK_INTERVAL
+    seconds.
+    """
+    directory = mark_grid_dir()
+    if not directory:
+        return None
+
+    year_id, version = stats_index.year_id, stats_index.version
+    with _loaded_lock:
+        grid = _loaded.get(year_id)
+        if grid is not None and grid.version == version:
+            return grid
+        missing_version, checked = _missing.get(year_id, (None, None))
+        if missing_version == version and time.monotonic() - checked < _recheck_interval():
+            return None
+
+    try:
+        grid = MarkGrid.load(directory, year_id, version)
+    except (OSError, ValueError):
+        with _loaded_lock:
+            _missing[year_id] = (version, time.monotonic())
+        return None
+    with _loaded_lock:
+        _loaded[year_id] = grid
+        _missing.pop(year_id, None)
+    return grid
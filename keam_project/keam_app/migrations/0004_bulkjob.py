@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:16
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keam_app', '0003_alter_board_year'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='board',
+            options={'ordering': ['year', 'name']},
+        ),
+        migrations.AlterModelOptions(
+            name='subjectstat',
+            options={'ordering': ['board__year', 'board__name', 'subject'], 'verbose_name': 'Subject Statistics', 'verbose_name_plural': 'Subject Statistics'},
+        ),
+        migrations.AlterModelOptions(
+            name='year',
+            options={'ordering': ['-value'], 'verbose_name': 'Academic Year', 'verbose_name_plural': 'Academic Years'},
+        ),
+        migrations.AlterField(
+            model_name='board',
+            name='year',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='keam_app.year'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='board',
+            unique_together={('name', 'year')},
+        ),
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('export_format', models.CharField(default='csv', max_length=4)),
+                ('source_file', models.FileField(upload_to='bulk_jobs/uploads/')),
+                ('result_file', models.FileField(blank=True, upload_to='bulk_jobs/results/')),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('rows_errored', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='keam_app.year')),
+            ],
+            options={
+                'verbose_name': 'Bulk Upload Job',
+                'verbose_name_plural': 'Bulk Upload Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='keam_app_bu_status_314df7_idx')],
+            },
+        ),
+    ]
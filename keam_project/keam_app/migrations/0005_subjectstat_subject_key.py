@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+# Frozen copy of keam_app.subjects.canonical_subject at the time of this migration
+SUBJECT_NAME_MAPPING = {
+    'maths': 'mathematics',
+    'physics': 'physics',
+    'chemistry': 'chemistry'
+}
+
+
+def canonical_subject(subject):
+    subject = subject.strip()
+    return SUBJECT_NAME_MAPPING.get(subject.lower(), subject).lower()
+
+
+def fill_subject_keys(apps, schema_editor):
+    """Set subject_key and collapse rows that now share (board, subject_key).
+
+    The survivor is the row the old subject__iexact lookup found first: an
+    exact case-insensitive match before an alias, then by subject and id.
+    """
+    SubjectStat = apps.get_model('keam_app', 'SubjectStat')
+
+    groups = {}
+    for stat in SubjectStat.objects.order_by('id'):
+        stat.subject_key = canonical_subject(stat.subject)
+        groups.setdefault((stat.board_id, stat.subject_key), []).append(stat)
+
+    survivors, duplicates = [], []
+    for (_, subject_key), stats in groups.items():
+        stats.sort(key=lambda stat: (stat.subject.lower() != subject_key, stat.subject, stat.id))
+        survivors.append(stats[0])
+        duplicates.extend(stat.id for stat in stats[1:])
+
+    SubjectStat.objects.filter(id__in=duplicates).delete()
+    SubjectStat.objects.bulk_update(survivors, ['subject_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keam_app', '0004_bulkjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subjectstat',
+            name='subject_key',
+            field=models.CharField(default='', editable=False, max_length=50),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_subject_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subjectstat',
+            constraint=models.UniqueConstraint(fields=('board', 'subject_key'), name='unique_board_subject_key'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keam_app', '0005_subjectstat_subject_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='cohort_file',
+            field=models.FileField(blank=True, upload_to='bulk_jobs/cohorts/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keam_app', '0006_bulkjob_cohort_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='unknown_boards',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
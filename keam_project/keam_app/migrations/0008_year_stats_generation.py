@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('keam_app', '0007_bulkjob_unknown_boards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='year',
+            name='stats_generation',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
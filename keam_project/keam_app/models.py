@@ -1,11 +1,27 @@
+import uuid
+
 from django.db import models
 
+from .subjects import canonical_subject
+
 class Year(models.Model):
     value = models.PositiveIntegerField(unique=True)
+    # Bumped in the database by stats.invalidate_stats whenever the year's
+    # boards or stats change; the stats snapshot records it per year
+    stats_generation = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return str(self.value)
 
+    def save(self, *args, **kwargs):
+        # Never write back a stats_generation read before the last bump
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'stats_generation'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-value']
         verbose_name = "Academic Year"
@@ -27,13 +43,68 @@ class Board(models.Model):
 class SubjectStat(models.Model):
     board = models.ForeignKey(Board, on_delete=models.CASCADE)
     subject = models.CharField(max_length=50)
+    subject_key = models.CharField(max_length=50, editable=False)  # canonical_subject(subject)
     mean = models.FloatField()
     sd = models.FloatField()
 
     def __str__(self):
         return f"{self.board.name} - {self.subject}"
 
+    def clean(self):
+        super().clean()
+        self.subject_key = canonical_subject(self.subject)
+
+    def validate_constraints(self, exclude=None):
+        # Forms exclude subject_key (not editable), but it follows subject, so
+        # "maths" next to "Mathematics" is a validation error, not an IntegrityError
+        if exclude is not None and 'subject' not in exclude:
+            exclude = set(exclude) - {'subject_key'}
+        super().validate_constraints(exclude=exclude)
+
+    def save(self, *args, **kwargs):
+        self.subject_key = canonical_subject(self.subject)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['board__year', 'board__name', 'subject']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'subject_key'], name='unique_board_subject_key'),
+        ]
         verbose_name = "Subject Statistics"
-        verbose_name_plural = "Subject Statistics"
\ No newline at end of file
+        verbose_name_plural = "Subject Statistics"
+
+class BulkJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    year = models.ForeignKey(Year, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    export_format = models.CharField(max_length=4, default='csv')
+    source_file = models.FileField(upload_to='bulk_jobs/uploads/')
+    result_file = models.FileField(upload_to='bulk_jobs/results/', blank=True)
+    cohort_file = models.FileField(upload_to='bulk_jobs/cohorts/', blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_errored = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    unknown_boards = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Bulk job {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "Bulk Upload Job"
+        verbose_name_plural = "Bulk Upload Jobs"
@@ -0,0 +1,169 @@
+import functools
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .instrumentation import add_rows, track_normalization
+
+SUBJECTS = ('maths', 'physics', 'chemistry')
+
+SCALING_FACTORS = {'maths': 1.5, 'physics': 0.9, 'chemistry': 0.6}  # KEAM 2025 scaling
+
+# Mean/SD used when a board has no statistics for a subject
+DEFAULT_STAT = (70.0, 10.0)
+
+# z-scores beyond +/-Z_LIMIT are clamped before the CDF is looked up
+Z_LIMIT = 8.0
+
+# Max absolute error of normal_cdf unless KEAM_PERCENTILE_TOLERANCE says otherwise
+DEFAULT_PERCENTILE_TOLERANCE = 1e-9
+
+# max |Phi''(z)| = max |z| * phi(z), reached at |z| = 1
+_MAX_CDF_CURVATURE = math.exp(-0.5) / math.sqrt(2 * math.pi)
+
+
+@functools.lru_cache(maxsize=None)
+def _cdf_table(tolerance):
+    """Uniform grid of exact CDF values over [-Z_LIMIT, Z_LIMIT].
+
+    Linear interpolation between grid points is off by at most
+    step**2 / 8 * max|Phi''|, so the step is picked to keep that under
+    ``tolerance``.
+    """
+    if tolerance <= 0:
+        raise ValueError(f"Percentile tolerance must be positive (was {tolerance})")
+    step = math.sqrt(8 * tolerance / _MAX_CDF_CURVATURE)
+    intervals = math.ceil(2 * Z_LIMIT / step)
+    step = 2 * Z_LIMIT / intervals
+    values = np.array([
+        0.5 * math.erfc(-(-Z_LIMIT + i * step) / math.sqrt(2)) for i in range(intervals + 1)
+    ])
+    return step, values
+
+
+def normal_cdf(z, tolerance=None):
+    """Standard normal CDF of ``z`` (clipped to +/-Z_LIMIT) from the interpolated table"""
+    if tolerance is None:
+        tolerance = getattr(settings, 'KEAM_PERCENTILE_TOLERANCE', DEFAULT_PERCENTILE_TOLERANCE)
+    step, values = _cdf_table(tolerance)
+
+    z = np.asarray(z, dtype=np.float64)
+    position = (np.clip(np.nan_to_num(z), -Z_LIMIT, Z_LIMIT) + Z_LIMIT) / step
+    index = np.minimum(position.astype(np.intp), len(values) - 2)
+    fraction = position - index
+    cdf = values[index] + fraction * (values[index + 1] - values[index])
+    return np.where(np.isnan(z), np.nan, cdf)
+
+
+def normalize_marks(x, mean_board, sd_board, mean_kerala, sd_kerala, normalized=None):
+    """Normalize whole columns of marks against board and Kerala HSE stats.
+
+    Every argument may be a scalar or an array; they are broadcast against
+    each other and each key of the returned dict holds a float64 array.
+    ``normalized`` may carry normalized marks already looked up in a
+    MarkGrid, NaN where they still have to be computed. The percentile and
+    Kerala z-score of looked-up marks are worked back from them, which is
+    exact to well within KEAM_PERCENTILE_TOLERANCE.
+    """
+    with track_normalization():
+        return _normalize_marks(x, mean_board, sd_board, mean_kerala, sd_kerala, normalized)
+
+
+def _board_percentile(z_score):
+    """Board percentile (0-100 scale) of z-scores"""
+    percentile = np.where(
+        z_score < -Z_LIMIT, 0.0001,
+        np.where(z_score > Z_LIMIT, 0.9999, normal_cdf(z_score))
+    )
+    return percentile * 100
+
+
+def _normalize_marks(x, mean_board, sd_board, mean_kerala, sd_kerala, normalized=None):
+    x = np.asarray(x, dtype=np.float64)
+    mean_board = np.asarray(mean_board, dtype=np.float64)
+    sd_board = np.asarray(sd_board, dtype=np.float64)
+    mean_kerala = np.asarray(mean_kerala, dtype=np.float64)
+    sd_kerala = np.asarray(sd_kerala, dtype=np.float64)
+
+    sd_board = np.where(sd_board <= 0, 0.1, sd_board)
+    sd_kerala = np.where(sd_kerala <= 0, 0.1, sd_kerala)
+
+    # Step 1: Compute board z-score
+    z_score = (x - mean_board) / sd_board
+
+    if normalized is None:
+        # Step 2: Convert z-score to percentile (0-100 scale)
+        percentile_percent = _board_percentile(z_score)
+
+        # Step 3: Convert percentile to Kerala HSE z-score using the formula
+        z_kerala = (percentile_percent - 50) / 29.0
+
+        # Step 4: Compute normalized mark
+        normalized = z_kerala * sd_kerala + mean_kerala
+    else:
+        # Looked-up marks skip steps 2-4; the rest take them as above
+        shape = np.broadcast_shapes(z_score.shape, np.shape(normalized), mean_kerala.shape, sd_kerala.shape)
+        normalized = np.array(np.broadcast_to(normalized, shape), dtype=np.float64)
+        z_score, mean_kerala, sd_kerala = np.broadcast_arrays(z_score, mean_kerala, sd_kerala)
+        missing = np.isnan(normalized)
+        if missing.any():
+            normalized[missing] = (
+                (_board_percentile(z_score[missing]) - 50) / 29.0 * sd_kerala[missing] + mean_kerala[missing]
+            )
+        z_kerala = (normalized - mean_kerala) / sd_kerala
+        percentile_percent = z_kerala * 29.0 + 50
+
+    x, mean_board, sd_board, z_score, percentile_percent, z_kerala, mean_kerala, sd_kerala, normalized = \
+        np.broadcast_arrays(x, mean_board, sd_board, z_score, percentile_percent,
+                            z_kerala, mean_kerala, sd_kerala, normalized)
+
+    return {
+        "student_mark": x,
+        "mean_source": mean_board,
+        "sd_source": sd_board,
+        "z_score": z_score,
+        "percentile": percentile_percent,
+        "z_kerala": z_kerala,
+        "mean_kerala": mean_kerala,
+        "sd_kerala": sd_kerala,
+        "normalized_mark": normalized
+    }
+
+
+def scaled_totals(normalized_marks):
+    """Weighted sum of normalized marks, keyed by subject, in SUBJECTS order."""
+    total = 0
+    for subject in SUBJECTS:
+        total = total + normalized_marks[subject] * SCALING_FACTORS[subject]
+    return total
+
+
+def final_scores(scaled_total, entrance):
+    """Final KEAM index (adjust if KEAM uses (scaled_total + entrance)/2)."""
+    return np.round(np.asarray(scaled_total, dtype=np.float64) + entrance, 4)
+
+
+def normalize_students(marks, board_stats, kerala_stats, entrance=0, normalized=None):
+    """Normalize a cohort in one pass.
+
+    ``marks`` maps each subject to an array of raw marks, ``board_stats`` and
+    ``kerala_stats`` map each subject to a ``(means, sds)`` pair of scalars or
+    per-row arrays. ``normalized`` optionally maps each subject to
+    precomputed normalized marks (see normalize_marks). Returns
+    ``(subject_results, scaled_total, final_score)``.
+    """
+    subject_results = {}
+    for subject in SUBJECTS:
+        mean_board, sd_board = board_stats[subject]
+        mean_kerala, sd_kerala = kerala_stats[subject]
+        subject_results[subject] = normalize_marks(
+            marks[subject], mean_board, sd_board, mean_kerala, sd_kerala,
+            normalized[subject] if normalized is not None else None
+        )
+
+    scaled_total = scaled_totals({
+        subject: data['normalized_mark'] for subject, data in subject_results.items()
+    })
+    add_rows(np.size(scaled_total))
+    return subject_results, scaled_total, final_scores(scaled_total, entrance)
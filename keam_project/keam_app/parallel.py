@@ -0,0 +1,133 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+from .instrumentation import add_rows, track_normalization
+from .normalization import SUBJECTS, normalize_students
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1  # single process
+DEFAULT_MIN_ROWS = 50000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parallel_workers():
+    return getattr(settings, 'KEAM_NORMALIZE_WORKERS', DEFAULT_WORKERS)
+
+
+def parallel_min_rows():
+    return getattr(settings, 'KEAM_PARALLEL_MIN_ROWS', DEFAULT_MIN_ROWS)
+
+
+def parallel_enabled():
+    return parallel_workers() > 1
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers only import numpy and the normalization code;
+            # forking a process that holds DB connections and locks is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=parallel_workers(), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def partition_by_board(board_codes, partitions):
+    """Split row positions into up to ``partitions`` groups of whole boards.
+
+    Rows are stably sorted by board code so each group covers a contiguous
+    run of boards, and groups are cut at the board boundary nearest to an
+    even split of the rows.
+    """
+    order = np.argsort(board_codes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(board_codes[order])) + 1
+    if not boundaries.size or partitions <= 1:
+        return [order]
+
+    targets = np.linspace(0, order.size, partitions + 1)[1:-1]
+    nearest = np.clip(np.searchsorted(boundaries, targets), 0, boundaries.size - 1)
+    return np.split(order, np.unique(boundaries[nearest]))
+
+
+def _take(value, positions):
+    return value[positions] if np.ndim(value) else value
+
+
+def normalize_students_parallel(marks, board_stats, kerala_stats, entrance, board_codes, normalized=None):
+    """normalize_students, spread over the process pool for large cohorts.
+
+    Falls back to a single process below KEAM_PARALLEL_MIN_ROWS rows, when
+    KEAM_NORMALIZE_WORKERS is 1, or if the pool breaks. Partitions are cut
+    along the per-row integer ``board_codes`` and scattered back, so results
+    keep row order.
+    """
+    row_count = len(board_codes)
+    if not parallel_enabled() or row_count < parallel_min_rows():
+        return normalize_students(marks, board_stats, kerala_stats, entrance, normalized)
+
+    partitions = partition_by_board(np.asarray(board_codes), parallel_workers())
+    if len(partitions) == 1:
+        return normalize_students(marks, board_stats, kerala_stats, entrance, normalized)
+
+    try:
+        with track_normalization():
+            pool = _get_pool()
+            futures = [
+                pool.submit(
+                    normalize_students,
+                    {subject: _take(marks[subject], positions) for subject in SUBJECTS},
+                    {
+                        subject: tuple(_take(values, positions) for values in board_stats[subject])
+                        for subject in SUBJECTS
+                    },
+                    kerala_stats,
+                    _take(entrance, positions),
+                    {subject: _take(normalized[subject], positions) for subject in SUBJECTS}
+                    if normalized is not None else None,
+                )
+                for positions in partitions
+            ]
+            outcomes = [future.result() for future in futures]
+    except BrokenProcessPool:
+        logger.exception("Normalization pool broke; normalizing in this process")
+        shutdown_pool()
+        return normalize_students(marks, board_stats, kerala_stats, entrance, normalized)
+
+    # Scatter each partition back to its original rows
+    subject_results = {
+        subject: {key: np.empty(row_count) for key in outcomes[0][0][subject]}
+        for subject in SUBJECTS
+    }
+    scaled_total, final_score = np.empty(row_count), np.empty(row_count)
+    for positions, (partition_results, partition_total, partition_final) in zip(partitions, outcomes):
+        for subject, columns in partition_results.items():
+            for key, values in columns.items():
+                subject_results[subject][key][positions] = values
+        scaled_total[positions] = partition_total
+        final_score[positions] = partition_final
+
+    add_rows(row_count)
+    return subject_results, scaled_total, final_score
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def _rank_against(ordered, scores):
+    """Rank ``scores`` against an ascending array of cohort scores.
+
+    Two binary searches per score give how many cohort scores are strictly
+    below and at most each score, so ranking n students costs O(n log n).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    below = np.searchsorted(ordered, scores, side='left')
+    not_above = np.searchsorted(ordered, scores, side='right')
+    tied = not_above - below
+
+    # Competition ranking: ties share the best rank ("1, 2, 2, 4")
+    rank = ordered.size - not_above + 1
+    if ordered.size:
+        percentile_rank = np.round((below + 0.5 * tied) / ordered.size * 100, 4)
+    else:
+        percentile_rank = np.zeros(scores.shape)
+    return rank, percentile_rank, tied
+
+
+class Cohort:
+    """Sorted final scores of an uploaded cohort, for rank lookups"""
+
+    def __init__(self, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        self.scores = np.sort(scores[np.isfinite(scores)])
+
+    def __len__(self):
+        return self.scores.size
+
+    def rank(self, scores):
+        """Rank, percentile rank and tie count arrays for ``scores``"""
+        return _rank_against(self.scores, scores)
+
+    def rank_of(self, score):
+        """Where a single score would place in this cohort.
+
+        ``same_score_count`` is how many cohort members have exactly this
+        score. It is not ``tied_with`` of ranked rows, which leaves the
+        student themself out: the queried score may or may not be one of
+        the cohort's own.
+        """
+        rank, percentile_rank, tied = self.rank([score])
+        return {
+            'score': float(score),
+            'rank': int(rank[0]),
+            'percentile_rank': float(percentile_rank[0]),
+            'same_score_count': int(tied[0]),
+            'cohort_size': len(self),
+        }
+
+    def save(self, file):
+        np.save(file, self.scores, allow_pickle=False)
+
+    @classmethod
+    def load(cls, file):
+        cohort = cls.__new__(cls)
+        cohort.scores = np.load(file, allow_pickle=False)
+        return cohort
+
+
+def rank_rows(rows):
+    """Buffer ``(row_number, result, row_errors)`` tuples and rank each result.
+
+    Every result gains ``rank``, ``percentile_rank`` and ``tied_with`` (other
+    students on the same final score); rows without a finite final score
+    get None. Returns the buffered rows and the cohort they were ranked in.
+    """
+    rows = list(rows)
+    ranked = [
+        result for _, result, _ in rows
+        if result is not None and np.isfinite(result['final_score'])
+    ]
+    cohort = Cohort([result['final_score'] for result in ranked])
+    rank, percentile_rank, tied = cohort.rank([result['final_score'] for result in ranked])
+
+    for result in (result for _, result, _ in rows if result is not None):
+        result.update(rank=None, percentile_rank=None, tied_with=None)
+    for result, row_rank, row_percentile, row_tied in zip(
+        ranked, rank.tolist(), percentile_rank.tolist(), tied.tolist()
+    ):
+        result.update(rank=row_rank, percentile_rank=row_percentile, tied_with=row_tied - 1)
+    return rows, cohort
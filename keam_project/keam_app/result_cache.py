@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_SIZE = 10000
+DEFAULT_TTL = 600  # seconds
+
+
+class ResultCache:
+    """Bounded LRU cache with per-entry TTL for computed single-student results.
+
+    Keys start with the year ID and the StatsIndex version they were
+    computed against, so results never outlive the stats they came from.
+    """
+
+    def __init__(self, max_size=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate_year(self, year_id):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == year_id]
+            for key in stale:
+                del self._entries[key]
+            self._counters['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        with self._lock:
+            return {**self._counters, 'size': len(self._entries), 'max_size': self.max_size}
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    getattr(settings, 'KEAM_RESULT_CACHE_SIZE', DEFAULT_SIZE),
+                    getattr(settings, 'KEAM_RESULT_CACHE_TTL', DEFAULT_TTL),
+                )
+    return _result_cache
@@ -0,0 +1,42 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Year, Board, SubjectStat
+from .stats import invalidate_stats, invalidate_year_choices
+
+
+def _deleted_with_parent(instance, origin):
+    """Whether ``instance`` goes in a cascade from a Year or Board delete.
+
+    The parent's own post_delete invalidates the year, so each child need
+    not (a Board query per SubjectStat included).
+    """
+    if origin is None or origin is instance:
+        return False
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is not type(instance) and origin_model in (Year, Board)
+
+
+@receiver([post_save, post_delete], sender=Year)
+def year_changed(sender, instance, **kwargs):
+    invalidate_year_choices()
+    invalidate_stats(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Board)
+def board_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_parent(instance, origin):
+        return
+    invalidate_stats(instance.year_id)
+
+
+@receiver([post_save, post_delete], sender=SubjectStat)
+def subject_stat_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_parent(instance, origin):
+        return
+    if SubjectStat.board.is_cached(instance):
+        year_id = instance.board.year_id
+    else:
+        year_id = Board.objects.filter(pk=instance.board_id).values_list('year_id', flat=True).first()
+    invalidate_stats(year_id)
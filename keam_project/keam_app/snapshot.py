@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+from itertools import groupby
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .files import write_atomically
+from .models import Board, Year
+
+logger = logging.getLogger(__name__)
+
+# Snapshot layout: one HEADER_DTYPE record, then ``years`` YEAR_DTYPE records
+# (ordered by year_id) and ``rows`` ROW_DTYPE records. Each year's rows are
+# rows[start:stop], one per (board, subject) plus one per board without
+# stats (NaN mean/sd). Bump SNAPSHOT_FORMAT whenever any of this changes;
+# files of another format are ignored.
+SNAPSHOT_MAGIC = b'KEAMSTAT'
+SNAPSHOT_FORMAT = 1
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('format', '<u4'),
+    ('years', '<u4'),
+    ('rows', '<u8'),
+])
+
+YEAR_DTYPE = np.dtype([
+    ('year_id', '<i8'),
+    ('generation', '<i8'),  # Year.stats_generation when exported
+    ('version', 'S16'),  # StatsIndex.version of the exported rows
+    ('start', '<u8'),
+    ('stop', '<u8'),
+])
+
+# Widths follow the Board.name and subject_key columns
+ROW_DTYPE = np.dtype([
+    ('board_id', '<i8'),
+    ('board', '<U100'),
+    ('subject_key', '<U50'),
+    ('mean', '<f8'),
+    ('sd', '<f8'),
+])
+
+_snapshot = None
+_loaded_from = None  # (path, mtime) of the last load attempt
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_path():
+    return getattr(settings, 'KEAM_STATS_SNAPSHOT', None)
+
+
+def _map(path, dtype, offset, count):
+    # mmap cannot map zero bytes
+    if not count:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+class SnapshotYear:
+    """One year of a snapshot: its generation and version when exported, and its rows"""
+
+    def __init__(self, generation, version, rows):
+        self.generation = generation
+        self.version = version
+        self._rows = rows
+
+    def rows(self):
+        """StatsIndex rows: ``(board id, board name, subject key, mean, sd)``"""
+        return [
+            (board_id, board, None, None, None) if mean != mean else (board_id, board, subject_key, mean, sd)
+            for board_id, board, subject_key, mean, sd in self._rows.tolist()
+        ]
+
+
+class StatsSnapshot:
+    """A read-only, memory-mapped export of every year's board statistics.
+
+    Workers map the same file, so its pages are shared between processes.
+    Each year carries the Year.stats_generation it was exported at; callers
+    compare that with the database before trusting the year's rows (see
+    stats._snapshot_stats_index).
+    """
+
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a stats snapshot")
+        if header['format'][0] != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} has snapshot format {header['format'][0]}, expected {SNAPSHOT_FORMAT}")
+        year_count, row_count = int(header['years'][0]), int(header['rows'][0])
+        expected_size = HEADER_DTYPE.itemsize + year_count * YEAR_DTYPE.itemsize + row_count * ROW_DTYPE.itemsize
+        if os.stat(path).st_size != expected_size:
+            raise ValueError(f"{path} is truncated")
+
+        self.path = path
+        self.years = _map(path, YEAR_DTYPE, HEADER_DTYPE.itemsize, year_count)
+        self.rows = _map(path, ROW_DTYPE, HEADER_DTYPE.itemsize + self.years.nbytes, row_count)
+        self._positions = {year_id: position for position, year_id in enumerate(self.years['year_id'].tolist())}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def year(self, year_id):
+        """The SnapshotYear of ``year_id``, or None when it was not exported"""
+        position = self._positions.get(year_id)
+        if position is None:
+            return None
+        _, generation, version, start, stop = self.years[position].tolist()
+        return SnapshotYear(generation, version.decode(), self.rows[start:stop])
+
+
+def export_stats_snapshot(path):
+    """Write every year's boards and stats (Kerala HSE included) to ``path``.
+
+    The file is replaced atomically; workers pick it up on their next stats
+    cache miss. Returns ``(years, rows)``.
+    """
+    from .stats import StatsIndex
+
+    # Generations and rows are read in one transaction so that they agree
+    with transaction.atomic():
+        generations = dict(Year.objects.values_list('id', 'stats_generation'))
+        records = sorted(
+            Board.objects.values_list(
+                'year_id', 'id', 'name', 'subjectstat__subject_key', 'subjectstat__mean', 'subjectstat__sd'
+            ),
+            key=lambda record: (record[0], record[1], record[3] or '')
+        )
+
+    years, rows = [], []
+    for year_id, year_records in groupby(records, key=lambda record: record[0]):
+        year_rows = [record[1:] for record in year_records]
+        version = StatsIndex.from_rows(year_id, year_rows).version
+        years.append((year_id, generations[year_id], version.encode(), len(rows), len(rows) + len(year_rows)))
+        rows.extend(
+            (board_id, name, subject_key or '', np.nan if mean is None else mean, np.nan if sd is None else sd)
+            for board_id, name, subject_key, mean, sd in year_rows
+        )
+    header = np.array([(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(years), len(rows))], dtype=HEADER_DTYPE)
+
+    def write(output):
+        output.write(header.tobytes())
+        output.write(np.array(years, dtype=YEAR_DTYPE).tobytes())
+        output.write(np.array(rows, dtype=ROW_DTYPE).tobytes())
+
+    write_atomically(path, write)
+    return len(years), len(rows)
+
+
+def load_stats_snapshot():
+    """Map the configured snapshot, if there is one; called once at startup"""
+    global _snapshot, _loaded_from
+    path = snapshot_path()
+    snapshot, modified = None, None
+    if path and os.path.exists(path):
+        try:
+            modified = os.stat(path).st_mtime
+            snapshot = StatsSnapshot(path)
+        except (OSError, ValueError):
+            logger.exception(f"Could not load stats snapshot {path}; using the database")
+    with _snapshot_lock:
+        _snapshot, _loaded_from = snapshot, (path, modified)
+    return snapshot
+
+
+def get_stats_snapshot():
+    """The mapped snapshot, remapped when the file was exported again; None without one"""
+    path = snapshot_path()
+    if not path:
+        return None
+    try:
+        modified = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _snapshot_lock:
+        snapshot, loaded_from = _snapshot, _loaded_from
+    # A file that failed to load is not retried until it is replaced
+    if loaded_from != (path, modified):
+        snapshot = load_stats_snapshot()
+    return snapshot
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import threading
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .models import Year, Board
+from .normalization import SUBJECTS, DEFAULT_STAT
+from .result_cache import get_result_cache
+from .snapshot import get_stats_snapshot
+from .subjects import canonical_subject
+
+logger = logging.getLogger(__name__)
+
+KERALA_BOARD_NAME = "Kerala HSE"
+
+# Seconds a cached StatsIndex or year list lives. Invalidation only reaches the
+# process that made the change unless the stats cache is shared, so other
+# workers pick changes up within this window.
+DEFAULT_STATS_CACHE_TIMEOUT = 60
+
+def ensure_kerala_board(stats_index, year):
+    """Make sure the year has a Kerala HSE board to normalize against"""
+    if stats_index.has_board(KERALA_BOARD_NAME):
+        return
+
+    kerala_board, created = Board.objects.get_or_create(
+        name=KERALA_BOARD_NAME,
+        year=year,
+        defaults={'name': KERALA_BOARD_NAME, 'year': year}
+    )
+    stats_index.add_board(kerala_board)
+    if created:
+        logger.warning(f"Created new Kerala HSE board for year {year}")
+
+
+class StatsIndex:
+    """All board statistics of one Year, keyed by (board name, canonical subject).
+
+    Built from a single query so that per-student lookups are dict hits
+    instead of one ``SubjectStat`` query per subject.
+    """
+
+    def __init__(self, year_id, boards=None, stats=None):
+        self.year_id = year_id
+        self.boards = boards if boards is not None else {}  # board name -> board id
+        self.stats = stats if stats is not None else {}  # (board name, subject) -> (mean, sd)
+        self.version = uuid.uuid4().hex  # for_year replaces this with a digest of the rows
+
+    @classmethod
+    def for_year(cls, year):
+        year_id = getattr(year, 'pk', year)
+        rows = (
+            Board.objects
+            .filter(year_id=year_id)
+            .values_list('id', 'name', 'subjectstat__subject_key', 'subjectstat__mean', 'subjectstat__sd')
+        )
+        return cls.from_rows(year_id, rows)
+
+    @classmethod
+    def from_rows(cls, year_id, rows):
+        """Index ``(board id, board name, subject key, mean, sd)`` rows; the
+        last three are None for a board without stats"""
+        index = cls(year_id)
+        rows = sorted(rows, key=lambda row: (row[0], row[2] or ''))
+        for board_id, board_name, subject_key, mean, sd in rows:
+            index.boards[board_name] = board_id
+            if subject_key is not None:
+                index.stats[(board_name, subject_key)] = (mean, sd)
+        # Same boards and stats give the same version in every process
+        index.version = _digest(rows)
+        return index
+
+    def has_board(self, board_name):
+        return board_name in self.boards
+
+    def add_board(self, board):
+        self.boards.setdefault(board.name, board.pk)
+
+    def get(self, board_name, view_subject, default=None):
+        """(mean, sd) for a board and view subject name, or ``default``"""
+        return self.stats.get((board_name, canonical_subject(view_subject)), default)
+
+    def __len__(self):
+        return len(self.stats)
+
+
+def gather_board_stats(stats_index, board_names):
+    """Resolve stats once per distinct board and gather them into row columns.
+
+    Returns ``(board_codes, board_stats, fallback)``: an integer code per row,
+    a ``(means, sds)`` pair of row arrays per subject, and per subject a
+    boolean row array marking rows whose board has no stats for it and so
+    got DEFAULT_STAT.
+    """
+    codes = {}
+    board_codes = np.fromiter(
+        (codes.setdefault(board_name, len(codes)) for board_name in board_names),
+        dtype=np.intp, count=len(board_names)
+    )
+
+    board_stats, fallback = {}, {}
+    for view_subject in SUBJECTS:
+        means = np.full(len(codes), DEFAULT_STAT[0])
+        sds = np.full(len(codes), DEFAULT_STAT[1])
+        missing = np.zeros(len(codes), dtype=bool)
+        for board_name, code in codes.items():
+            stat = stats_index.get(board_name, view_subject)
+            if stat:
+                means[code], sds[code] = stat
+            else:
+                missing[code] = True
+        board_stats[view_subject] = (means[board_codes], sds[board_codes])
+        fallback[view_subject] = missing[board_codes]
+    return board_codes, board_stats, fallback
+
+
+def _digest(rows):
+    return hashlib.sha1(repr(rows).encode()).hexdigest()[:16]
+
+
+_cache_counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'snapshot_hits': 0}
+_cache_counters_lock = threading.Lock()
+
+
+def _count(counter):
+    with _cache_counters_lock:
+        _cache_counters[counter] += 1
+
+
+def stats_cache():
+    """The cache holding stats indexes, year choices and page fragments"""
+    return caches[getattr(settings, 'KEAM_STATS_CACHE_ALIAS', 'default')]
+
+
+def _stats_cache_timeout():
+    return getattr(settings, 'KEAM_STATS_CACHE_TIMEOUT', DEFAULT_STATS_CACHE_TIMEOUT)
+
+
+def _stats_cache_key(year_id):
+    return f"keam:stats:{year_id}"
+
+
+_YEAR_CHOICES_KEY = "keam:years"
+
+
+def get_stats_index(year):
+    """StatsIndex for a year, served from the stats cache when possible"""
+    year_id = getattr(year, 'pk', year)
+    cache = stats_cache()
+    key = _stats_cache_key(year_id)
+
+    stats_index = cache.get(key)
+    if stats_index is not None:
+        _count('hits')
+        return stats_index
+
+    _count('misses')
+    stats_index = _snapshot_stats_index(year_id)
+    if stats_index is None:
+        stats_index = StatsIndex.for_year(year_id)
+    cache.set(key, stats_index, _stats_cache_timeout())
+    return stats_index
+
+
+def _snapshot_stats_index(year_id):
+    """StatsIndex from the stats snapshot, or None when it has no current copy of the year.
+
+    The year's copy is current while Year.stats_generation still has the
+    value it was exported at; checking that is one single-row query.
+    """
+    snapshot = get_stats_snapshot()
+    if snapshot is None:
+        return None
+    snapshot_year = snapshot.year(year_id)
+    if snapshot_year is None:
+        return None
+
+    generation = Year.objects.filter(pk=year_id).values_list('stats_generation', flat=True).first()
+    if generation != snapshot_year.generation:
+        return None
+    stats_index = StatsIndex.from_rows(year_id, snapshot_year.rows())
+    if stats_index.version != snapshot_year.version:
+        logger.warning(f"Stats snapshot {snapshot.path} does not round-trip year {year_id}; using the database")
+        return None
+    _count('snapshot_hits')
+    return stats_index
+
+
+def invalidate_stats(*year_ids):
+    """Bump each given year's stats generation and drop its cached StatsIndex.
+
+    The bump joins the caller's transaction, so it commits with the stats
+    it covers. Cached indexes are dropped at once, for this process's own
+    reads, and again once the transaction commits, since other workers can
+    cache the old stats until then.
+    """
+    year_ids = {year_id for year_id in year_ids if year_id is not None}
+    if not year_ids:
+        return
+    Year.objects.filter(pk__in=year_ids).update(stats_generation=F('stats_generation') + 1)
+    _drop_cached_stats(year_ids)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _drop_cached_stats(year_ids))
+    with _cache_counters_lock:
+        _cache_counters['invalidations'] += len(year_ids)
+    logger.debug(f"Invalidated cached stats for years {sorted(year_ids)}")
+
+
+def _drop_cached_stats(year_ids):
+    stats_cache().delete_many([_stats_cache_key(year_id) for year_id in year_ids])
+    result_cache = get_result_cache()
+    for year_id in year_ids:
+        result_cache.invalidate_year(year_id)
+
+
+def get_year_choices():
+    """``(version, [(year id, value), ...])`` for all years, newest first, cached"""
+    cache = stats_cache()
+    choices = cache.get(_YEAR_CHOICES_KEY)
+    if choices is None:
+        years = list(Year.objects.order_by('-value').values_list('id', 'value'))
+        choices = (_digest(years), years)
+        cache.set(_YEAR_CHOICES_KEY, choices, _stats_cache_timeout())
+    return choices
+
+
+def invalidate_year_choices():
+    stats_cache().delete(_YEAR_CHOICES_KEY)
+
+
+def stats_cache_info():
+    """Hit/miss/invalidation counters of this process"""
+    with _cache_counters_lock:
+        return dict(_cache_counters)
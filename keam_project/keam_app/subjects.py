@@ -0,0 +1,15 @@
+# Map view subject names to database subject names
+SUBJECT_NAME_MAPPING = {
+    'maths': 'mathematics',
+    'physics': 'physics',
+    'chemistry': 'chemistry'
+}
+
+
+def get_db_subject_name(view_subject):
+    return SUBJECT_NAME_MAPPING.get(view_subject.lower(), view_subject)
+
+
+def canonical_subject(subject):
+    """Indexed lookup key for a view or database subject name ('Maths ' -> 'mathematics')"""
+    return get_db_subject_name(subject.strip()).lower()
@@ -1,3 +1,1029 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.forms import modelform_factory
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import benchmarks, mark_grids
+from .admin import import_subject_stats
+from .bulk import UnknownBoards, read_mark_sheet, normalize_mark_sheet
+from .db import PublicReadRouter
+from .bulk_results import SUBJECT_KEYS, BulkResult, ResultBlock, expand
+from .exports import export_header
+from .mark_grids import MarkGrid, get_mark_grid, materialize_mark_grids
+from .jobs import claim_next_job, job_retention, job_timeout, purge_expired_jobs, run_bulk_job, submit_bulk_job
+from .models import Year, Board, SubjectStat, BulkJob
+from .snapshot import SNAPSHOT_FORMAT, load_stats_snapshot
+from .normalization import normal_cdf, normalize_marks, normalize_students
+from .parallel import normalize_students_parallel, partition_by_board, shutdown_pool
+from .ranking import Cohort, rank_rows
+from .result_cache import ResultCache, get_result_cache
+from .stats import StatsIndex, gather_board_stats, get_stats_index, invalidate_stats, stats_cache_info
+from .views import normalize_mark
+from .year_selection import YEAR_COOKIE_NAME
+
+# A snapshot exported or grids materialized on the developer's machine must
+# not leak into the tests; StatsSnapshotTests and MarkGridTests point these
+# at their own files
+_local_files_override = override_settings(KEAM_STATS_SNAPSHOT=None, KEAM_MARK_GRID_DIR=None)
+
+
+def setUpModule():
+    _local_files_override.enable()
+
+
+def tearDownModule():
+    _local_files_override.disable()
+
+
+class NormalizeMarksTests(SimpleTestCase):
+    def test_scalar_wrapper_matches_batch(self):
+        marks = np.array([0.0, 12.5, 55.55, 70.0, 99.99, 100.0])
+        batch = normalize_marks(marks, 65.2, 14.3, 71.4, 16.2)
+        for position, mark in enumerate(marks):
+            single = normalize_mark(float(mark), 65.2, 14.3, 71.4, 16.2)
+            for key, values in batch.items():
+                self.assertEqual(single[key], values[position])
+
+    def test_extreme_z_scores_are_clamped(self):
+        result = normalize_marks([-1000.0, 1000.0], 50.0, 1.0, 70.0, 10.0)
+        self.assertEqual(result['percentile'].tolist(), [0.0001 * 100, 0.9999 * 100])
+
+    def test_non_positive_sd_is_replaced(self):
+        result = normalize_mark(60.0, 50.0, 0, 70.0, -1)
+        self.assertEqual(result['sd_source'], 0.1)
+        self.assertEqual(result['sd_kerala'], 0.1)
+
+    def test_normalize_students_per_row_stats(self):
+        marks = {subject: np.array([60.0, 80.0]) for subject in ('maths', 'physics', 'chemistry')}
+        board_stats = {subject: (np.array([50.0, 70.0]), np.array([10.0, 5.0])) for subject in marks}
+        kerala_stats = {subject: (70.0, 10.0) for subject in marks}
+        subject_results, scaled_total, final_score = normalize_students(
+            marks, board_stats, kerala_stats, np.array([100.0, 0.0])
+        )
+
+        single = normalize_mark(80.0, 70.0, 5.0, 70.0, 10.0)
+        self.assertEqual(subject_results['physics']['normalized_mark'][1], single['normalized_mark'])
+        expected = single['normalized_mark'] * 1.5 + single['normalized_mark'] * 0.9 + single['normalized_mark'] * 0.6
+        self.assertAlmostEqual(scaled_total[1], expected)
+        self.assertEqual(final_score[0], round(scaled_total[0] + 100.0, 4))
+
+
+class NormalCdfTests(SimpleTestCase):
+    def test_max_deviation_from_scipy_within_tolerance(self):
+        from scipy.stats import norm
+
+        z = np.linspace(-8, 8, 1_000_001)
+        for tolerance in (1e-6, 1e-9):
+            deviation = np.abs(normal_cdf(z, tolerance) - norm.cdf(z)).max()
+            self.assertLessEqual(deviation, tolerance)
+
+    def test_nan_and_out_of_range(self):
+        self.assertTrue(np.isnan(normal_cdf(np.nan)))
+        self.assertEqual(normal_cdf(50.0), normal_cdf(8.0))
+        self.assertAlmostEqual(float(normal_cdf(0.0)), 0.5, places=12)
+
+
+class ParallelNormalizationTests(SimpleTestCase):
+    def test_partitions_keep_boards_whole(self):
+        codes = np.array([2, 0, 1, 0, 2, 1, 1, 0])
+        partitions = partition_by_board(codes, 2)
+        self.assertEqual(len(partitions), 2)
+        self.assertEqual(sorted(np.concatenate(partitions).tolist()), list(range(8)))
+        self.assertFalse(set(codes[partitions[0]]) & set(codes[partitions[1]]))
+
+    @override_settings(KEAM_NORMALIZE_WORKERS=2, KEAM_PARALLEL_MIN_ROWS=1)
+    def test_matches_single_process_in_row_order(self):
+        self.addCleanup(shutdown_pool)
+        rng = np.random.default_rng(0)
+        boards = rng.choice(["CBSE", "ISC", "State"], size=50)
+        board_codes = np.unique(boards, return_inverse=True)[1]
+        marks = {subject: rng.uniform(0, 100, 50) for subject in ('maths', 'physics', 'chemistry')}
+        board_stats = {
+            subject: (np.where(boards == "CBSE", 65.0, 55.0), np.where(boards == "ISC", 12.0, 9.0))
+            for subject in marks
+        }
+        kerala_stats = {subject: (72.0, 15.0) for subject in marks}
+        entrance = rng.uniform(0, 300, 50)
+
+        expected = normalize_students(marks, board_stats, kerala_stats, entrance)
+        subject_results, scaled_total, final_score = normalize_students_parallel(
+            marks, board_stats, kerala_stats, entrance, board_codes
+        )
+        np.testing.assert_array_equal(final_score, expected[2])
+        np.testing.assert_array_equal(scaled_total, expected[1])
+        for subject, columns in expected[0].items():
+            for key, values in columns.items():
+                np.testing.assert_array_equal(subject_results[subject][key], values)
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_app_startup_does_not_import_pandas_or_scipy(self):
+        probe = (
+            "import django, sys; django.setup(); "
+            "import keam_app.urls, keam_app.admin; "
+            "print(sorted(name for name in ('pandas', 'scipy') if name in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'keam_project.settings'},
+        )
+        self.assertEqual(output.stdout.strip(), "[]")
+
+
+class StatsIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = Year.objects.create(value=2025)
+        kerala = Board.objects.create(name="Kerala HSE", year=cls.year)
+        cbse = Board.objects.create(name="CBSE", year=cls.year)
+        Board.objects.create(name="ISC", year=cls.year)
+        SubjectStat.objects.create(board=kerala, subject="Mathematics", mean=72.0, sd=15.0)
+        SubjectStat.objects.create(board=cbse, subject="mathematics", mean=65.0, sd=12.0)
+        SubjectStat.objects.create(board=cbse, subject="physics", mean=60.0, sd=11.0)
+        other_year = Year.objects.create(value=2024)
+        SubjectStat.objects.create(
+            board=Board.objects.create(name="CBSE", year=other_year), subject="chemistry", mean=1.0, sd=1.0
+        )
+
+    def test_lookup_is_case_insensitive_and_year_scoped(self):
+        with self.assertNumQueries(1):
+            index = StatsIndex.for_year(self.year)
+        self.assertEqual(index.get("Kerala HSE", "maths"), (72.0, 15.0))
+        self.assertEqual(index.get("CBSE", "physics"), (60.0, 11.0))
+        self.assertIsNone(index.get("CBSE", "chemistry"))
+        self.assertTrue(index.has_board("ISC"))
+        self.assertFalse(index.has_board("State"))
+
+    def test_gather_board_stats_by_code(self):
+        index = StatsIndex.for_year(self.year)
+        codes, board_stats, fallback = gather_board_stats(index, ["CBSE", "ISC", "CBSE"])
+        self.assertEqual(codes.tolist(), [0, 1, 0])
+        self.assertEqual(board_stats['physics'][0].tolist(), [60.0, 70.0, 60.0])
+        self.assertEqual(board_stats['physics'][1].tolist(), [11.0, 10.0, 11.0])
+        self.assertEqual(fallback['physics'].tolist(), [False, True, False])
+        self.assertEqual(fallback['chemistry'].tolist(), [True, True, True])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_result_view_queries_do_not_grow_per_subject(self):
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+        cbse = Board.objects.get(name="CBSE", year=self.year)
+        with self.assertNumQueries(4):  # session, year, board choice, stats index
+            response = self.client.post('/result/', {
+                'board': cbse.id, 'maths': 80, 'physics': 70, 'chemistry': 60, 'entrance': 150
+            })
+        result = response.context['result']
+        self.assertEqual(
+            result['normalized']['maths']['normalized_mark'],
+            normalize_mark(80.0, 65.0, 12.0, 72.0, 15.0)['normalized_mark']
+        )
+
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        self.board = Board.objects.create(name="CBSE", year=self.year)
+        self.stat = SubjectStat.objects.create(board=self.board, subject="physics", mean=60.0, sd=11.0)
+
+    def test_cached_until_stats_change(self):
+        before = stats_cache_info()
+        get_stats_index(self.year)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stats_index(self.year).get("CBSE", "physics"), (60.0, 11.0))
+        after = stats_cache_info()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+        self.stat.mean = 61.0
+        self.stat.save()
+        self.assertEqual(get_stats_index(self.year).get("CBSE", "physics"), (61.0, 11.0))
+
+        self.board.delete()
+        self.assertIsNone(get_stats_index(self.year).get("CBSE", "physics"))
+
+    def test_cascading_deletes_invalidate_each_year_once(self):
+        for number in range(20):
+            board = Board.objects.create(name=f"Board {number}", year=self.year)
+            for subject in ("maths", "physics", "chemistry"):
+                SubjectStat.objects.create(board=board, subject=subject, mean=60.0, sd=10.0)
+
+        before = stats_cache_info()['invalidations']
+        with CaptureQueriesContext(connection) as queries:
+            self.year.delete()
+        self.assertEqual(stats_cache_info()['invalidations'] - before, 1)
+        self.assertLess(len(queries), 15)
+
+        before = stats_cache_info()['invalidations']
+        year = Year.objects.create(value=2026)
+        Board.objects.create(name="ISC", year=year).delete()
+        self.assertEqual(stats_cache_info()['invalidations'] - before, 3)  # create, board create, board delete
+
+    @override_settings(KEAM_STATS_CACHE_TIMEOUT=0)
+    def test_unsignalled_changes_are_seen_once_entries_expire(self):
+        get_stats_index(self.year)
+        SubjectStat.objects.filter(pk=self.stat.pk).update(mean=62.0)  # as if saved by another worker
+        self.assertEqual(get_stats_index(self.year).get("CBSE", "physics"), (62.0, 11.0))
+
+
+class StatsSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'stats.bin')
+        self.year = Year.objects.create(value=2025)
+        Board.objects.create(name="Kerala HSE", year=self.year)
+        self.board = Board.objects.create(name="CBSE", year=self.year)
+        self.stat = SubjectStat.objects.create(board=self.board, subject="physics", mean=60.5, sd=11.0)
+        Board.objects.create(name="ISC", year=Year.objects.create(value=2024))
+
+        settings_override = override_settings(KEAM_STATS_SNAPSHOT=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(load_stats_snapshot)
+        call_command('export_stats_snapshot', stdout=io.StringIO())
+
+    def test_indexes_come_from_snapshot_until_stats_change(self):
+        from_db = StatsIndex.for_year(self.year)
+        before = stats_cache_info()['snapshot_hits']
+        with self.assertNumQueries(1):  # the year's stats generation
+            from_snapshot = get_stats_index(self.year)
+        self.assertEqual(from_snapshot.stats, from_db.stats)
+        self.assertEqual(from_snapshot.boards, from_db.boards)
+        self.assertEqual(from_snapshot.version, from_db.version)
+        self.assertEqual(stats_cache_info()['snapshot_hits'] - before, 1)
+
+        self.stat.mean = 61.0
+        self.stat.save()
+        self.assertEqual(get_stats_index(self.year).get("CBSE", "physics"), (61.0, 11.0))
+        self.assertEqual(stats_cache_info()['snapshot_hits'] - before, 1)
+
+        # Saving a Year loaded before the bump does not write the old generation back
+        generation = Year.objects.get(pk=self.year.pk).stats_generation
+        self.year.save()
+        self.assertEqual(Year.objects.get(pk=self.year.pk).stats_generation, generation + 1)
+
+    def test_changes_seen_by_other_workers_skip_the_snapshot(self):
+        # Renames and swapped values keep counts and sums, and another
+        # worker's cache never saw the invalidation: only the generation moved
+        Board.objects.filter(pk=self.board.pk).update(name="CBSE Delhi")
+        invalidate_stats(self.year.id)
+        cache.clear()
+        self.assertEqual(get_stats_index(self.year).get("CBSE Delhi", "physics"), (60.5, 11.0))
+
+        call_command('export_stats_snapshot', stdout=io.StringIO())
+        before = stats_cache_info()['snapshot_hits']
+        cache.clear()
+        self.assertTrue(get_stats_index(self.year).has_board("CBSE Delhi"))
+        self.assertEqual(stats_cache_info()['snapshot_hits'] - before, 1)
+
+    def test_snapshot_of_another_format_is_ignored(self):
+        with open(self.path, 'r+b') as snapshot:
+            snapshot.seek(8)
+            snapshot.write(np.array([SNAPSHOT_FORMAT + 1], dtype='<u4').tobytes())
+        self.addCleanup(os.unlink, self.path)
+        with self.assertLogs('keam_app.snapshot', 'ERROR'):
+            self.assertIsNone(load_stats_snapshot())
+        self.assertEqual(get_stats_index(self.year).get("CBSE", "physics"), (60.5, 11.0))
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        Board.objects.create(name="Kerala HSE", year=self.year)
+        self.board = Board.objects.create(name="CBSE", year=self.year)
+        self.stat = SubjectStat.objects.create(board=self.board, subject="physics", mean=60.0, sd=11.0)
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+
+    def post_result(self):
+        return self.client.post('/result/', {
+            'board': self.board.id, 'maths': 80, 'physics': 70, 'chemistry': 60, 'entrance': 150
+        })
+
+    def test_repeat_submission_is_served_from_cache_until_stats_change(self):
+        first = self.post_result().context['result']
+        before = get_result_cache().info()
+        self.assertEqual(self.post_result().context['result'], first)
+        self.assertEqual(get_result_cache().info()['hits'] - before['hits'], 1)
+
+        self.stat.mean = 50.0
+        self.stat.save()
+        changed = self.post_result().context['result']
+        self.assertNotEqual(changed['normalized']['physics'], first['normalized']['physics'])
+
+    def test_lru_eviction_and_ttl(self):
+        result_cache = ResultCache(max_size=2, ttl=60)
+        result_cache.set((1, 'a'), 'A')
+        result_cache.set((1, 'b'), 'B')
+        result_cache.get((1, 'a'))
+        result_cache.set((2, 'c'), 'C')
+        self.assertIsNone(result_cache.get((1, 'b')))
+        self.assertEqual(result_cache.get((1, 'a')), 'A')
+        self.assertEqual(result_cache.info()['evictions'], 1)
+
+        result_cache.invalidate_year(1)
+        self.assertIsNone(result_cache.get((1, 'a')))
+        self.assertEqual(result_cache.get((2, 'c')), 'C')
+
+        expired = ResultCache(max_size=2, ttl=0)
+        expired.set((1, 'a'), 'A')
+        self.assertIsNone(expired.get((1, 'a')))
+        self.assertEqual(expired.info()['expirations'], 1)
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        Board.objects.create(name="CBSE", year=self.year)
+
+    def test_intro_revalidates_until_years_change(self):
+        response = self.client.get('/')
+        etag = response['ETag']
+        self.assertContains(response, '<option value="%d">2025</option>' % self.year.id)
+        self.assertIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Year.objects.create(value=2026)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "2026")
+
+    def test_visitors_without_csrf_cookie_get_the_page_again(self):
+        response = self.client.get('/')
+        etag = response['ETag']
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+        # Cleared or expired cookies: a 304 would leave the cached form without a CSRF cookie
+        self.client.cookies.pop(settings.CSRF_COOKIE_NAME)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_imported_years_are_listed(self):
+        etag = self.client.get('/')['ETag']
+        import_subject_stats(pd.DataFrame([
+            {'year': 2031, 'board': "CBSE", 'subject': "Physics", 'mean': 60.0, 'sd': 11.0},
+        ]))
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "2031")
+
+    def test_marks_form_revalidates_until_boards_change(self):
+        self.client.post('/select-year/', {'year': self.year.id})
+
+        etag = self.client.get('/marks-form/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/marks-form/')
+        self.assertContains(response, "CBSE")
+        self.assertEqual(self.client.get('/marks-form/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Board.objects.create(name="ISC", year=self.year)
+        response = self.client.get('/marks-form/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "ISC")
+
+
+class YearSelectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        Board.objects.create(name="CBSE", year=self.year)
+
+    def test_selection_is_a_signed_cookie_without_db_writes(self):
+        with self.assertNumQueries(0):
+            response = self.client.post('/select-year/', {'year': self.year.id})
+        self.assertRedirects(response, '/marks-form/', fetch_redirect_response=False)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertContains(self.client.get('/marks-form/'), "CBSE")
+
+        self.client.cookies[YEAR_COOKIE_NAME] = str(self.year.id)  # unsigned
+        self.assertRedirects(self.client.get('/marks-form/'), '/', fetch_redirect_response=False)
+
+    def test_legacy_session_year_moves_into_cookie(self):
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+
+        response = self.client.get('/marks-form/')
+        self.assertContains(response, "CBSE")
+        self.assertIn(YEAR_COOKIE_NAME, response.cookies)
+        with self.assertNumQueries(0):
+            self.client.get('/marks-form/')
+
+    @override_settings(KEAM_YEAR_SELECTION='session')
+    def test_session_mode(self):
+        self.client.post('/select-year/', {'year': self.year.id})
+        self.assertEqual(self.client.session['year_id'], str(self.year.id))
+        self.assertNotIn(YEAR_COOKIE_NAME, self.client.cookies)
+        self.assertContains(self.client.get('/marks-form/'), "CBSE")
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    databases = {'default', 'readonly'}  # the test connects its own wrappers to a temporary file
+
+    def test_sqlite_connections_are_tuned_and_reader_is_query_only(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(directory, 'keam.sqlite3')}
+        writer = SQLiteDatabaseWrapper(dict(settings_dict), alias='default')
+        reader = SQLiteDatabaseWrapper(dict(settings_dict), alias='readonly')
+        self.addCleanup(writer.close)
+        self.addCleanup(reader.close)
+
+        with writer.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("CREATE TABLE marks (mark REAL)")
+            cursor.execute("INSERT INTO marks VALUES (1)")
+
+        # An open import transaction does not block the reader
+        writer.set_autocommit(False)
+        with writer.cursor() as cursor:
+            cursor.execute("INSERT INTO marks VALUES (2)")
+            with reader.cursor() as read_cursor:
+                read_cursor.execute("SELECT COUNT(*) FROM marks")
+                self.assertEqual(read_cursor.fetchone()[0], 1)
+                with self.assertRaises(OperationalError):
+                    read_cursor.execute("INSERT INTO marks VALUES (3)")
+        writer.rollback()
+        writer.set_autocommit(True)
+
+    def test_router_only_diverts_public_reads(self):
+        router = PublicReadRouter()
+        self.assertIsNone(router.db_for_read(Year))
+        self.assertEqual(router.db_for_write(Year), 'default')
+        self.assertFalse(router.allow_migrate('readonly', 'keam_app'))
+        self.assertTrue(router.allow_migrate('default', 'keam_app'))
+
+
+class SubjectKeyTests(TestCase):
+    def test_subject_key_is_canonical_and_unique_per_board(self):
+        board = Board.objects.create(name="CBSE", year=Year.objects.create(value=2025))
+        stat = SubjectStat.objects.create(board=board, subject=" Maths", mean=65.0, sd=12.0)
+        self.assertEqual(stat.subject_key, "mathematics")
+        self.assertEqual(StatsIndex.for_year(board.year_id).get("CBSE", "maths"), (65.0, 12.0))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SubjectStat.objects.create(board=board, subject="MATHEMATICS", mean=1.0, sd=1.0)
+
+    def test_admin_form_reports_duplicate_subject_keys(self):
+        board = Board.objects.create(name="CBSE", year=Year.objects.create(value=2025))
+        SubjectStat.objects.create(board=board, subject="Mathematics", mean=65.0, sd=12.0)
+        StatForm = modelform_factory(SubjectStat, fields=['board', 'subject', 'mean', 'sd'])  # as in the admin
+
+        form = StatForm({'board': board.pk, 'subject': "maths", 'mean': 60.0, 'sd': 10.0})
+        self.assertFalse(form.is_valid())
+        self.assertIn(NON_FIELD_ERRORS, form.errors)
+
+        form = StatForm({'board': board.pk, 'subject': "physics", 'mean': 60.0, 'sd': 10.0})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().subject_key, "physics")
+
+
+class ImportSubjectStatsTests(TestCase):
+    def test_bulk_upsert_counts_and_errors(self):
+        year = Year.objects.create(value=2024)
+        cbse = Board.objects.create(name="CBSE", year=year)
+        SubjectStat.objects.create(board=cbse, subject="Physics", mean=60.0, sd=10.0)
+        SubjectStat.objects.create(board=cbse, subject="chemistry", mean=55.0, sd=9.0)
+
+        df = pd.DataFrame({
+            'year': [2024, 2024, 2024, 2025, 2025, 'abc', 2025],
+            'board': ["CBSE", "CBSE", "CBSE", "ISC", "ISC", "ISC", "ISC"],
+            'subject': ["physics", "Chemistry", "mathematics", "physics", "Physics", "physics", "maths"],
+            'mean': [62.0, 55.0, 70.0, 50.0, 51.0, 1.0, 40.0],
+            'sd': [11.0, 9.0, 12.0, 8.0, 8.5, 1.0, 0],
+        })
+        counts, errors = import_subject_stats(df)
+
+        self.assertEqual(counts, {'created': 2, 'updated': 2, 'skipped': 1})
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("Row 7: "))
+        self.assertEqual(errors[1], "Row 8: SD must be positive (was 0.0)")
+
+        self.assertEqual(SubjectStat.objects.get(board=cbse, subject="Physics").mean, 62.0)
+        isc = Board.objects.get(name="ISC", year__value=2025)
+        isc_physics = SubjectStat.objects.get(board=isc)
+        self.assertEqual((isc_physics.subject, isc_physics.mean, isc_physics.sd), ("Physics", 51.0, 8.5))
+        self.assertEqual(SubjectStat.objects.get(board=cbse, subject="Mathematics").sd, 12.0)
+
+    def test_stats_generation_moves_inside_the_import_transaction(self):
+        year = Year.objects.create(value=2024)
+        generation = Year.objects.get(pk=year.pk).stats_generation
+        savepoints = []
+
+        def record_savepoints(*year_ids):
+            savepoints.append(len(connection.savepoint_ids))
+            invalidate_stats(*year_ids)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with mock.patch('keam_app.admin.invalidate_stats', side_effect=record_savepoints):
+                import_subject_stats(pd.DataFrame([
+                    {'year': 2024, 'board': "CBSE", 'subject': "Physics", 'mean': 60.0, 'sd': 11.0},
+                ]))
+        # Bumped within the import's own atomic block, not after it
+        self.assertEqual(savepoints, [len(connection.savepoint_ids) + 1])
+        self.assertEqual(Year.objects.get(pk=year.pk).stats_generation, generation + 1)
+        # Other workers' caches are cleared again once the import commits
+        self.assertEqual(len(callbacks), 1)
+
+
+class MarkSheetStreamingTests(TestCase):
+    def test_chunked_csv_matches_single_pass(self):
+        cache.clear()
+        year = Year.objects.create(value=2025)
+        for name, mean in (("Kerala HSE", 70.0), ("CBSE", 65.0)):
+            board = Board.objects.create(name=name, year=year)
+            for subject in ("mathematics", "physics", "chemistry"):
+                SubjectStat.objects.create(board=board, subject=subject, mean=mean, sd=12.0)
+
+        lines = ["Board ,maths,Physics,CHEMISTRY,Entrance"]
+        lines += [f"CBSE,{40 + row},{50 + row},{60 + row},{row * 3}" for row in range(9)]
+        lines += [" ,10,10,10,10", "State,80,0,x,0"]
+        content = "\n".join(lines).encode()
+
+        def run(chunk_size):
+            upload = SimpleUploadedFile("marks.csv", content)
+            return list(normalize_mark_sheet(read_mark_sheet(upload, chunk_size), year))
+
+        chunked = run(4)
+        self.assertEqual(chunked, run(100))
+        self.assertEqual([row_number for row_number, _, _ in chunked], list(range(2, 13)))
+        self.assertEqual(chunked[9], (11, None, ["Missing board name"]))
+        _, state, state_errors = chunked[10]
+        self.assertEqual(state['marks'], {'maths': 80.0, 'physics': 0, 'chemistry': 0})
+        self.assertEqual(state_errors, ["Unknown board 'State'"])
+        self.assertTrue(state['subject_results']['maths']['stats_fallback'])
+        self.assertFalse(chunked[0][1]['subject_results']['maths']['stats_fallback'])
+
+
+    def test_unknown_boards_are_summarized_without_writes(self):
+        cache.clear()
+        year = Year.objects.create(value=2025)
+        for name in ("Kerala HSE", "CBSE", "ISC"):
+            SubjectStat.objects.create(
+                board=Board.objects.create(name=name, year=year), subject="physics", mean=60.0, sd=12.0
+            )
+        content = b"Board,Maths,Physics,Chemistry\nCBES,1,2,3\nCBSE,1,2,3\ncbes,1,2,3\nCBES,1,2,3\n,1,2,3\nZZZ,1,2,3\n"
+
+        unknown_boards = UnknownBoards()
+        boards_before = Board.objects.count()
+        with CaptureQueriesContext(connection) as captured:
+            rows = list(normalize_mark_sheet(
+                read_mark_sheet(SimpleUploadedFile("marks.csv", content)), year, unknown_boards
+            ))
+        self.assertFalse([query for query in captured if not query['sql'].startswith('SELECT')])
+        self.assertEqual(Board.objects.count(), boards_before)
+
+        self.assertEqual(rows[0][2], ["Unknown board 'CBES' (did you mean 'CBSE'?)"])
+        self.assertEqual(rows[4][2], ["Missing board name"])
+        self.assertEqual(unknown_boards.summary(), [
+            {'board': 'CBES', 'rows': 2, 'suggestions': ['CBSE']},
+            {'board': 'cbes', 'rows': 1, 'suggestions': ['CBSE']},
+            {'board': 'ZZZ', 'rows': 1, 'suggestions': []},
+        ])
+
+
+class BulkResultTests(SimpleTestCase):
+    def setUp(self):
+        subject_columns = {
+            view_subject: {
+                **{key: np.array([float(position), 1.0]) for position, key in enumerate(SUBJECT_KEYS)},
+                'stats_fallback': np.array([False, True]),
+            }
+            for view_subject in ('maths', 'physics', 'chemistry')
+        }
+        marks = {view_subject: np.array([80.0, 50.0]) for view_subject in subject_columns}
+        self.block = ResultBlock(
+            ["CBSE", "ISC"], marks, np.array([150.0, 0.0]), np.array([1.5, 2.5]), np.array([151.5, 2.5]),
+            subject_columns, [[], ["No stats for maths"]]
+        )
+
+    def test_expands_to_the_dict_shape(self):
+        result = BulkResult(self.block, 1)
+        self.assertEqual(result['board'], "ISC")
+        self.assertEqual(result['marks'], {'maths': 50.0, 'physics': 50.0, 'chemistry': 50.0})
+        self.assertEqual(result['subject_results']['physics']['stats_fallback'], True)
+        self.assertEqual(result['errors'], ["No stats for maths"])
+        self.assertNotIn('rank', result)
+        self.assertEqual(result, expand(result))
+        self.assertIsInstance(expand(result)['final_score'], float)
+
+    def test_only_rank_fields_are_writable(self):
+        first, second = BulkResult(self.block, 0), BulkResult(self.block, 1)
+        first.update(rank=1, percentile_rank=75.0, tied_with=0)
+        second['rank'] = None
+        self.assertEqual((first['rank'], first['percentile_rank'], first['tied_with']), (1, 75.0, 0))
+        self.assertIsNone(second['rank'])
+        with self.assertRaises(KeyError):
+            first['board'] = "ISC"
+
+
+class BulkExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        board = Board.objects.create(name="CBSE", year=self.year)
+        SubjectStat.objects.create(board=board, subject="mathematics", mean=65.0, sd=12.0)
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+
+    def upload(self, export_format):
+        content = b"Board,Maths,Physics,Chemistry,Entrance\nCBSE,80,70,60,150\n ,1,1,1,1\n"
+        return self.client.post('/upload/', {
+            'marks_file': SimpleUploadedFile("marks.csv", content), 'format': export_format
+        })
+
+    def test_csv_export_streams_rows(self):
+        response = self.upload('csv')
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], export_header())
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][:2], ['2', 'CBSE'])
+        self.assertEqual(rows[1][-1], "No stats for physics; No stats for chemistry")
+        self.assertEqual(rows[2][0], '3')
+        self.assertEqual(rows[2][-1], "Missing board name")
+
+    def test_page_lists_ranked_rows(self):
+        content = b"Board,Maths,Physics,Chemistry,Entrance\nCBSE,80,70,60,150\nCBES,50,40,30,100\n"
+        response = self.client.post('/upload/', {'marks_file': SimpleUploadedFile("marks.csv", content)})
+        self.assertTemplateUsed(response, 'keam_app/bulk_results.html')
+        results = response.context['results']
+        self.assertEqual([result['rank'] for result in results], [1, 2])
+        self.assertEqual(response.context['unknown_boards'], [{'board': 'CBES', 'rows': 1, 'suggestions': ['CBSE']}])
+        self.assertContains(response, "did you mean CBSE?")
+
+    def test_xlsx_export_is_readable(self):
+        response = self.upload('xlsx')
+        workbook = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 3)
+        self.assertIn('<t>Final Score</t>', sheet)
+
+
+class MarkGridTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Year IDs and stats versions repeat between tests, so forget earlier grids
+        mark_grids._loaded.clear()
+        mark_grids._missing.clear()
+        self.grid_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.grid_dir)
+        self.year = Year.objects.create(value=2025)
+        kerala = Board.objects.create(name="Kerala HSE", year=self.year)
+        self.board = Board.objects.create(name="CBSE", year=self.year)
+        for subject, mean, sd in (("maths", 72.0, 15.0), ("physics", 68.0, 13.0), ("chemistry", 66.0, 12.0)):
+            SubjectStat.objects.create(board=kerala, subject=subject, mean=mean, sd=sd)
+        SubjectStat.objects.create(board=self.board, subject="maths", mean=65.0, sd=12.0)
+        self.client.post('/select-year/', {'year': self.year.id})
+
+    def post_result(self, maths):
+        return self.client.post('/result/', {
+            'board': self.board.id, 'maths': maths, 'physics': 70, 'chemistry': 60, 'entrance': 150
+        }).context['result']
+
+    def upload(self):
+        content = b"Board,Maths,Physics,Chemistry,Entrance\nCBSE,80.07,70,60.5,150\nICSE,55.123,101,0,90\n"
+        response = self.client.post('/upload/', {
+            'marks_file': SimpleUploadedFile("marks.csv", content), 'format': 'csv'
+        })
+        return b"".join(response.streaming_content)
+
+    def test_grid_lookups_match_exact_normalization(self):
+        grid = MarkGrid.build(StatsIndex.for_year(self.year))
+        rows = grid.board_rows(["CBSE", "CBSE", "CBSE", "Unknown"])
+        marks = [80.07, 100.0, 80.071, 42.5]
+        normalized = grid.lookup('maths', rows, marks)
+        self.assertTrue(np.isnan(normalized[2]))
+        exact = normalize_marks(np.array(marks), [65.0, 65.0, 65.0, 70.0], [12.0, 12.0, 12.0, 10.0], 72.0, 15.0)
+        looked_up = normalize_marks(
+            np.array(marks), [65.0, 65.0, 65.0, 70.0], [12.0, 12.0, 12.0, 10.0], 72.0, 15.0, normalized
+        )
+        self.assertEqual(exact['normalized_mark'].tolist(), looked_up['normalized_mark'].tolist())
+        self.assertEqual(exact['z_score'].tolist(), looked_up['z_score'].tolist())
+        np.testing.assert_allclose(looked_up['percentile'], exact['percentile'], rtol=0, atol=1e-9)
+        np.testing.assert_allclose(looked_up['z_kerala'], exact['z_kerala'], rtol=0, atol=1e-9)
+
+    def assert_same_results(self, result, expected):
+        self.assertEqual(result['final_score'], expected['final_score'])
+        for view_subject, norm_data in expected['normalized'].items():
+            for key, value in norm_data.items():
+                if key in ('percentile', 'z_kerala'):
+                    self.assertAlmostEqual(result['normalized'][view_subject][key], value, places=9)
+                else:
+                    self.assertEqual(result['normalized'][view_subject][key], value)
+
+    def assert_same_upload(self, upload, expected):
+        upload = list(csv.reader(io.StringIO(upload.decode())))
+        expected = list(csv.reader(io.StringIO(expected.decode())))
+        self.assertEqual(upload[0], expected[0])
+        self.assertEqual(len(upload), len(expected))
+        for row, expected_row in zip(upload[1:], expected[1:]):
+            for column, value, expected_value in zip(upload[0], row, expected_row):
+                if column.endswith('Percentile'):
+                    self.assertAlmostEqual(float(value), float(expected_value), places=9)
+                else:
+                    self.assertEqual(value, expected_value)
+
+    def test_views_use_materialized_grid_with_identical_results(self):
+        exact_result, exact_upload = self.post_result(80.07), self.upload()
+
+        with override_settings(KEAM_MARK_GRID_DIR=self.grid_dir):
+            self.assertEqual(materialize_mark_grids([self.year.id]), 1)
+            grid = get_mark_grid(get_stats_index(self.year))
+            self.assertEqual(grid.board_names, ["CBSE", "Kerala HSE"])
+            self.assertIsInstance(grid.normalized, np.memmap)
+            get_result_cache().clear()
+            self.assert_same_results(self.post_result(80.07), exact_result)
+            self.assert_same_upload(self.upload(), exact_upload)
+
+            # New stats make the grid stale, so it is no longer used
+            SubjectStat.objects.create(board=self.board, subject="physics", mean=60.0, sd=11.0)
+            self.assertIsNone(get_mark_grid(get_stats_index(self.year)))
+            materialize_mark_grids([self.year.id])
+            self.assertEqual(sorted(os.listdir(self.grid_dir)), [
+                f"year_{self.year.id}_{get_stats_index(self.year).version}.{extension}" for extension in ('json', 'npy')
+            ])
+
+    def test_missing_grids_are_not_looked_for_on_every_request(self):
+        stats_index = get_stats_index(self.year)
+        with override_settings(KEAM_MARK_GRID_DIR=self.grid_dir):
+            self.assertIsNone(get_mark_grid(stats_index))
+            MarkGrid.build(stats_index).save(self.grid_dir)
+            # Written by another process: seen once the recheck interval has passed
+            self.assertIsNone(get_mark_grid(stats_index))
+            with override_settings(KEAM_MARK_GRID_RECHECK_INTERVAL=0):
+                self.assertEqual(get_mark_grid(stats_index).version, stats_index.version)
+
+
+class RankingTests(SimpleTestCase):
+    def test_ties_share_the_best_rank(self):
+        cohort = Cohort([50.0, 90.0, 70.0, 70.0, float('nan')])
+        rank, percentile_rank, tied = cohort.rank([90.0, 70.0, 50.0])
+        self.assertEqual(rank.tolist(), [1, 2, 4])
+        self.assertEqual(percentile_rank.tolist(), [87.5, 50.0, 12.5])
+        self.assertEqual(tied.tolist(), [1, 2, 1])
+        self.assertEqual(cohort.rank_of(80.0)['rank'], 2)
+        self.assertEqual(cohort.rank_of(10.0)['rank'], 5)
+        self.assertEqual(len(cohort), 4)
+
+    def test_rank_rows(self):
+        rows = [
+            (2, {'final_score': 60.0}, []),
+            (3, None, ["Missing board name"]),
+            (4, {'final_score': 80.0}, []),
+            (5, {'final_score': 60.0}, []),
+        ]
+        rows, cohort = rank_rows(iter(rows))
+        self.assertEqual(len(cohort), 3)
+        self.assertEqual(rows[0][1], {'final_score': 60.0, 'rank': 2, 'percentile_rank': 33.3333, 'tied_with': 1})
+        self.assertEqual(rows[2][1]['rank'], 1)
+        self.assertIsNone(rows[1][1])
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = Year.objects.create(value=2025)
+        self.board = Board.objects.create(name="CBSE", year=self.year)
+        SubjectStat.objects.create(board=self.board, subject="mathematics", mean=65.0, sd=12.0)
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    async def test_result_and_marks_form(self):
+        response = await self.async_client.get('/marks-form/')
+        self.assertContains(response, "CBSE")
+        response = await self.async_client.post('/result/', {
+            'board': self.board.id, 'maths': 80, 'physics': 70, 'chemistry': 60, 'entrance': 150
+        })
+        self.assertEqual(
+            response.context['result']['normalized']['maths']['normalized_mark'],
+            normalize_mark(80.0, 65.0, 12.0, 70.0, 10.0)['normalized_mark']
+        )
+
+    async def test_export_streams_asynchronously(self):
+        content = b"Board,Maths,Physics,Chemistry,Entrance\nCBSE,80,70,60,150\nCBSE,50,40,30,100\n"
+        response = await self.async_client.post('/upload/', {
+            'marks_file': SimpleUploadedFile("marks.csv", content), 'format': 'csv'
+        })
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+
+class BulkJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.year = Year.objects.create(value=2025)
+        board = Board.objects.create(name="CBSE", year=self.year)
+        SubjectStat.objects.create(board=board, subject="mathematics", mean=65.0, sd=12.0)
+
+    def test_submit_process_and_download(self):
+        content = b"Board,Maths,Physics,Chemistry\nCBSE,80,70,60\nCBSE,50,40,30\n ,1,1,1\n"
+        response = self.client.post('/upload/jobs/', {
+            'marks_file': SimpleUploadedFile("marks.csv", content), 'year': self.year.id
+        })
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+
+        self.assertEqual(self.client.get(job['progress_url']).json()['status'], BulkJob.PENDING)
+        self.assertEqual(self.client.get(job['download_url']).status_code, 409)
+
+        call_command('process_bulk_jobs', '--once', stdout=io.StringIO())
+
+        progress = self.client.get(job['progress_url']).json()
+        self.assertEqual(progress['status'], BulkJob.DONE)
+        self.assertEqual((progress['rows_processed'], progress['rows_errored']), (3, 3))
+
+        download = self.client.get(job['download_url'])
+        rows = list(csv.reader(io.StringIO(b"".join(download.streaming_content).decode())))
+        download.close()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], export_header(ranked=True))
+        self.assertEqual([row[-4] for row in rows[1:]], ['1', '2', ''])
+        self.assertEqual(rows[3][-1], "Missing board name")
+
+        first_score = float(rows[1][rows[0].index('Final Score')])
+        self.assertEqual(self.client.get(job['rank_url'], {'score': first_score + 1}).json()['rank'], 1)
+        ranked = self.client.get(job['rank_url'], {'score': first_score}).json()
+        self.assertEqual((ranked['rank'], ranked['percentile_rank'], ranked['cohort_size']), (1, 75.0, 2))
+        self.assertEqual(ranked['same_score_count'], 1)
+        self.assertNotIn('tied_with', ranked)
+        self.assertEqual(self.client.get(job['rank_url'], {'score': 'x'}).status_code, 400)
+
+    def test_orphaned_jobs_are_reclaimed_and_old_jobs_purged(self):
+        content = SimpleUploadedFile("marks.csv", b"Board,Maths,Physics,Chemistry\nCBSE,80,70,60\n")
+        job = submit_bulk_job(self.year, content)
+        self.assertEqual(claim_next_job().id, job.id)
+        self.assertIsNone(claim_next_job())
+
+        # Its worker died an hour ago
+        BulkJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(seconds=job_timeout() + 1))
+        job = run_bulk_job(claim_next_job())
+        self.assertEqual(job.status, BulkJob.DONE)
+        files = [job.source_file.path, job.result_file.path, job.cohort_file.path]
+
+        self.assertEqual(purge_expired_jobs(), 0)
+        BulkJob.objects.filter(id=job.id).update(finished_at=timezone.now() - timedelta(seconds=job_retention() + 1))
+        self.assertEqual(purge_expired_jobs(), 1)
+        self.assertFalse(BulkJob.objects.exists())
+        self.assertFalse(any(os.path.exists(path) for path in files))
+
+
+class NormalizeApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = Year.objects.create(value=2025)
+        for name, mean, sd in (("Kerala HSE", 72.0, 15.0), ("CBSE", 65.0, 12.0)):
+            board = Board.objects.create(name=name, year=cls.year)
+            for subject in ("Mathematics", "physics"):
+                SubjectStat.objects.create(board=board, subject=subject, mean=mean, sd=sd)
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json')
+
+    def test_single_matches_result_view(self):
+        student = {'year': 2025, 'board': "CBSE", 'maths': 80, 'physics': 70, 'chemistry': 60, 'entrance': 150}
+        response = self.post('/api/normalize/', student)
+        self.assertEqual(response.status_code, 200)
+
+        session = self.client.session
+        session['year_id'] = self.year.id
+        session.save()
+        cbse = Board.objects.get(name="CBSE")
+        view = self.client.post('/result/', {**student, 'board': cbse.id})
+        expected = view.context['result']
+
+        result = response.json()['result']
+        self.assertEqual(result['normalized'], expected['normalized'])
+        self.assertEqual(result['final_score'], expected['final_score'])
+        self.assertEqual(response.json()['errors'], list(view.context['errors']))
+
+    def test_batch_reports_errors_per_student(self):
+        students = [
+            {'year': 2025, 'board': "CBSE", 'maths': 80, 'physics': 70, 'chemistry': 60},
+            {'year': 2025, 'board': "Nowhere", 'maths': 80, 'physics': 70, 'chemistry': 60},
+            {'year': 1999, 'board': "CBSE", 'maths': 80, 'physics': 70, 'chemistry': 60},
+            {'year': 2025, 'board': "CBSE", 'maths': "abc", 'physics': 70},
+        ] * 50
+        with self.assertNumQueries(2):  # year lookup, stats index
+            response = self.post('/api/normalize/batch/', {'students': students})
+        results = response.json()['results']
+        self.assertEqual(len(results), 200)
+        self.assertIsNotNone(results[0]['result'])
+        self.assertEqual(results[1]['errors'], ["Unknown board 'Nowhere' for 2025"])
+        self.assertEqual(results[2]['errors'], ["No statistics for year 1999"])
+        self.assertEqual(results[3]['errors'], ["maths must be a number", "chemistry is required"])
+        self.assertEqual(results[4], results[0])
+
+
+class BenchmarkSmokeTests(TestCase):
+    def test_benchmarks_run_on_synthetic_data(self):
+        cache.clear()
+        year = benchmarks.load_stats(years=2, boards=3)
+        self.assertEqual(SubjectStat.objects.filter(board__year=year).count(), 4 * 3)
+
+        for result in (
+            benchmarks.bench_result(year, repeat=2),
+            benchmarks.bench_bulk_upload(year, rows=50, boards=3, repeat=2),
+            benchmarks.bench_admin_import(years=2, boards=3, repeat=2),
+        ):
+            self.assertGreater(result['throughput_per_s'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+@override_settings(KEAM_INSTRUMENTATION=True)
+class InstrumentationTests(TestCase):
+    def test_server_timing_and_metrics(self):
+        cache.clear()
+        year = Year.objects.create(value=2025)
+        board = Board.objects.create(name="CBSE", year=year)
+        SubjectStat.objects.create(board=board, subject="mathematics", mean=65.0, sd=12.0)
+        session = self.client.session
+        session['year_id'] = year.id
+        session.save()
+
+        response = self.client.post('/result/', {
+            'board': board.id, 'maths': 80, 'physics': 70, 'chemistry': 60, 'entrance': 120
+        })
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('desc="1 rows"', timing)
+
+        export = self.client.post('/upload/', {
+            'marks_file': SimpleUploadedFile("marks.csv", b"Board,Maths,Physics,Chemistry\nCBSE,1,2,3\nCBSE,4,5,6\n"),
+            'format': 'csv',
+        })
+        b"".join(export.streaming_content)
+
+        metrics = self.client.get('/metrics/').content.decode()
+        self.assertIn('keam_requests_total{view="keam_app:result"}', metrics)
+        self.assertIn('keam_rows_processed_total{view="keam_app:upload"} 2', metrics)
+        self.assertIn('keam_stats_cache_hits_total', metrics)
+
+    async def test_async_requests_are_recorded(self):
+        await cache.aclear()
+        year = await Year.objects.acreate(value=2025)
+        await Board.objects.acreate(name="CBSE", year=year)
+
+        response = await self.async_client.post('/select-year/', {'year': year.id})
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get('/marks-form/')
+        self.assertContains(response, "CBSE")
+        # The form's queries run in a sync_to_async thread and are still counted
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(KEAM_INSTRUMENTATION=False)
+    def test_disabled_adds_nothing(self):
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
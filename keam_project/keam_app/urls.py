@@ -1,6 +1,6 @@
 # keam_app/urls.py
 from django.urls import path
-from . import views
+from . import api, instrumentation, views
 
 app_name = 'keam_app'  # App namespace
 
@@ -10,4 +10,12 @@ urlpatterns = [
     path('marks-form/', views.marks_form, name='marks_form'),  # This must exist
     path('result/', views.result, name='result'),
     path('upload/', views.upload_and_process, name='upload'),
+    path('upload/jobs/', views.submit_upload_job, name='submit_job'),
+    path('upload/jobs/<uuid:job_id>/', views.upload_job_progress, name='job_progress'),
+    path('upload/jobs/<uuid:job_id>/download/', views.upload_job_download, name='job_download'),
+    path('upload/jobs/<uuid:job_id>/rank/', views.upload_job_rank, name='job_rank'),
+    path('api/normalize/', api.normalize_api, name='api_normalize'),
+    path('api/normalize/batch/', api.normalize_batch_api, name='api_normalize_batch'),
+    path('metrics/', instrumentation.metrics_view, name='metrics'),
+    path('metrics/stats-cache/', views.stats_cache_metrics, name='stats_cache_metrics'),
 ]
\ No newline at end of file
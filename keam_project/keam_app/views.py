@@ -1,27 +1,99 @@
+import hashlib
+import itertools
 import logging
-import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from .db import public_reads
+from .bulk import UnknownBoards, read_mark_sheet, normalize_mark_sheet
+from .exports import EXPORT_FORMATS, iter_export
+from .instrumentation import add_rows
+from .ranking import rank_rows
+from .result_cache import get_result_cache
+from .mark_grids import get_mark_grid
+from .jobs import submit_bulk_job, job_cohort, job_progress
 from .forms import MarkEntryForm
-from .models import Year, Board, SubjectStat
-from django.http import JsonResponse
+from .models import Year, BulkJob
+from .normalization import SCALING_FACTORS, DEFAULT_STAT, normalize_marks, final_scores
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from scipy.stats import norm
-import pandas as pd
+from .year_selection import aselected_year_id, migrates_year_selection, remember_year, selected_year_id
+from .stats import KERALA_BOARD_NAME, ensure_kerala_board, get_stats_index, get_year_choices, stats_cache, \
+    stats_cache_info
 
 logger = logging.getLogger(__name__)
 
-# Map view subject names to database subject names
-SUBJECT_NAME_MAPPING = {
-    'maths': 'mathematics',
-    'physics': 'physics',
-    'chemistry': 'chemistry'
-}
+# Export chunks produced per hop to the worker thread when streaming under ASGI
+ASYNC_STREAM_BATCH = 200
 
 
-def intro(request):
+async def _render(request, template_name, context):
+    """Render off the event loop; form widgets query their choices while rendering"""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def _selected_year(request):
+    """The year picked on the intro page, or None; looked up in the cached year choices"""
+    year_id = await aselected_year_id(request)
+    if not year_id:
+        return None
+
+    try:
+        year_id = int(year_id)
+    except (TypeError, ValueError):
+        return None
+    _, years = await sync_to_async(get_year_choices)()
+    value = dict(years).get(year_id)
+    return Year(id=year_id, value=value) if value is not None else None
+
+
+def _cached_fragment(key, render_fragment):
+    """Rendered HTML that only changes with the version baked into ``key``"""
+    return stats_cache().get_or_set(key, render_fragment, None)
+
+
+def _page_etag(request, version):
+    """ETag of a page of ``version`` rendered for the visitor's CSRF secret.
+
+    The page's form token is only accepted with that secret, so a visitor
+    whose CSRF cookie is gone or has changed gets a fresh page (which sets
+    the cookie again) rather than a 304.
+    """
+    secret = request.META.get('CSRF_COOKIE', '')
+    return quote_etag(f"{version}-{hashlib.sha256(secret.encode()).hexdigest()[:16]}")
+
+
+def _not_modified(request, version):
+    """A 304 when the client already has this version of the page, else None"""
+    return get_conditional_response(request, etag=_page_etag(request, version))
+
+
+def _with_etag(request, response, version):
+    # Pages carry a per-visitor CSRF token, so only the visitor's own cache may keep them
+    response['ETag'] = _page_etag(request, version)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@public_reads
+async def intro(request):
     """Show introduction page with year selection"""
-    years = Year.objects.all().order_by('-value')
-    return render(request, 'keam_app/intro.html', {'years': years})
+    version, years = await sync_to_async(get_year_choices)()
+    page_version = f"intro-{version}"
+    not_modified = _not_modified(request, page_version)
+    if not_modified is not None:
+        return not_modified
+
+    year_options = await sync_to_async(_cached_fragment)(
+        f"keam:fragment:years:{version}",
+        lambda: render_to_string('keam_app/fragments/year_options.html', {'years': years}),
+    )
+    response = await _render(request, 'keam_app/intro.html', {'year_options': year_options})
+    return _with_etag(request, response, page_version)
 
 
 def select_year(request):
@@ -29,51 +101,17 @@ def select_year(request):
     if request.method == 'POST':
         year_id = request.POST.get('year')
         if year_id:
-            request.session['year_id'] = year_id
-            return redirect('keam_app:marks_form')
+            response = redirect('keam_app:marks_form')
+            remember_year(request, response, year_id)
+            return response
     return redirect('keam_app:intro')
 
 
-def get_db_subject_name(view_subject):
-    return SUBJECT_NAME_MAPPING.get(view_subject.lower(), view_subject)
-
-
-def normalize_mark(x, mean_board, sd_board, mean_kerala, sd_kerala):
+def normalize_mark(x, mean_board, sd_board, mean_kerala, sd_kerala, normalized=None):
+    """Normalize a single mark; thin scalar wrapper over normalize_marks"""
     try:
-        if sd_board <= 0:
-            sd_board = 0.1
-        if sd_kerala <= 0:
-            sd_kerala = 0.1
-
-        # Step 1: Compute board z-score
-        z_score = (x - mean_board) / sd_board
-
-        # Step 2: Convert z-score to percentile (0-100 scale)
-        if z_score < -8:
-            percentile = 0.0001
-        elif z_score > 8:
-            percentile = 0.9999
-        else:
-            percentile = norm.cdf(z_score)
-        percentile_percent = percentile * 100  # Convert to percentage (0-100)
-
-        # Step 3: Convert percentile to Kerala HSE z-score using the formula
-        z_kerala = (percentile_percent - 50) / 29.0
-
-        # Step 4: Compute normalized mark
-        normalized = z_kerala * sd_kerala + mean_kerala
-
-        return {
-            "student_mark": x,
-            "mean_source": mean_board,
-            "sd_source": sd_board,
-            "z_score": z_score,
-            "percentile": percentile_percent,
-            "z_kerala": z_kerala,
-            "mean_kerala": mean_kerala,
-            "sd_kerala": sd_kerala,
-            "normalized_mark": normalized
-        }
+        norm_data = normalize_marks(x, mean_board, sd_board, mean_kerala, sd_kerala, normalized)
+        return {key: value.item() for key, value in norm_data.items()}
     except Exception as e:
         logger.error(f"Normalization error: {e}")
         return {
@@ -83,26 +121,30 @@ def normalize_mark(x, mean_board, sd_board, mean_kerala, sd_kerala):
         }
 
 
-def result(request):
+@public_reads
+@migrates_year_selection
+async def result(request):
     if request.method != 'POST':
         return redirect('keam_app:marks_form')
 
-    year_id = request.session.get('year_id')
-    if not year_id:
+    year = await _selected_year(request)
+    if year is None:
         return redirect('keam_app:intro')
 
-    try:
-        year = Year.objects.get(id=year_id)
-    except Year.DoesNotExist:
-        return redirect('keam_app:intro')
+    # Validation, stats lookups and normalization block, so they run in one hop to a worker thread
+    context = await sync_to_async(_result_context)(request.POST, year)
+    return await _render(request, 'keam_app/results.html', context)
+
 
-    form = MarkEntryForm(request.POST, year=year)
+def _result_context(data, year):
+    """Validate a marks form and normalize it into the results page context"""
+    form = MarkEntryForm(data, year=year)
     error_msgs = []
     context = {'result': None, 'errors': error_msgs}
 
     if not form.is_valid():
         error_msgs.extend(form.errors.values())
-        return render(request, 'keam_app/results.html', context)
+        return context
 
     try:
         board = form.cleaned_data['board']
@@ -113,47 +155,46 @@ def result(request):
             'chemistry': form.cleaned_data['chemistry']
         }
 
-        # Get or create Kerala board
-        kerala_board, created = Board.objects.get_or_create(
-            name="Kerala HSE",
-            year=board.year,
-            defaults={'name': "Kerala HSE", 'year': board.year}
+        stats_index = get_stats_index(year)
+        ensure_kerala_board(stats_index, year)
+
+        # Repeat submissions are answered from the result cache
+        result_cache = get_result_cache()
+        cache_key = (
+            year.pk, stats_index.version, board.pk,
+            marks['maths'], marks['physics'], marks['chemistry'], entrance
         )
-        if created:
-            logger.warning(f"Created new Kerala HSE board for year {board.year}")
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            context['result'], cached_errors = cached
+            error_msgs.extend(cached_errors)
+            return context
 
         # Get Kerala stats with fallbacks
         kerala_stats = {}
         for view_subject, mark in marks.items():
-            db_subject = get_db_subject_name(view_subject)
-            stat = SubjectStat.objects.filter(
-                board=kerala_board,
-                subject__iexact=db_subject
-            ).first()
-            kerala_stats[view_subject] = (stat.mean, stat.sd) if stat else (70.0, 10.0)
+            stat = stats_index.get(KERALA_BOARD_NAME, view_subject)
+            kerala_stats[view_subject] = stat or DEFAULT_STAT
             if not stat:
                 error_msgs.append(f"No Kerala HSE stats for {view_subject} - using default values")
 
-        # Normalize marks
+        # Normalize marks, looking them up in the materialized grid when there is one
+        mark_grid = get_mark_grid(stats_index)
         normalized = {}
-        scaling_factors = {'maths': 1.5, 'physics': 0.9, 'chemistry': 0.6}  # KEAM 2025 scaling
         scaled_total = 0
 
         for view_subject, mark in marks.items():
-            db_subject = get_db_subject_name(view_subject)
-            stat = SubjectStat.objects.filter(
-                board=board,
-                subject__iexact=db_subject
-            ).first()
+            stat = stats_index.get(board.name, view_subject)
 
             if not stat:
                 error_msgs.append(f"No {board.name} stats for {view_subject} - using fallback values")
-                stat_mean, stat_sd = 70.0, 10.0
+                stat_mean, stat_sd = DEFAULT_STAT
             else:
-                stat_mean, stat_sd = stat.mean, stat.sd
+                stat_mean, stat_sd = stat
 
             mean_kerala, sd_kerala = kerala_stats[view_subject]
-            norm_data = normalize_mark(mark, stat_mean, stat_sd, mean_kerala, sd_kerala)
+            looked_up = mark_grid.normalized_mark(board.name, view_subject, mark) if mark_grid else None
+            norm_data = normalize_mark(mark, stat_mean, stat_sd, mean_kerala, sd_kerala, looked_up)
 
             if 'error' in norm_data:
                 error_msgs.append(f"Normalization failed for {view_subject}: {norm_data['error']}")
@@ -161,10 +202,10 @@ def result(request):
 
             norm_data["board_name"] = board.name
             normalized[view_subject] = norm_data
-            scaled_total += norm_data["normalized_mark"] * scaling_factors[view_subject]
+            scaled_total += norm_data["normalized_mark"] * SCALING_FACTORS[view_subject]
 
-        # Final score (adjust if KEAM uses (scaled_total + entrance)/2)
-        final_score = round(scaled_total + entrance, 4)  # Modify as needed
+        final_score = final_scores(scaled_total, entrance).item()
+        add_rows(1)
 
         context['result'] = {
             'normalized': normalized,
@@ -172,162 +213,210 @@ def result(request):
             'final_score': final_score,
             'original': {**marks, 'entrance': entrance}
         }
+        result_cache.set(cache_key, (context['result'], tuple(error_msgs)))
 
     except Exception as e:
         logger.exception("Error in result calculation")
         error_msgs.append("An error occurred during calculation. Please try again.")
 
-    return render(request, 'keam_app/results.html', context)
+    return context
 
 
-@csrf_exempt
-def upload_and_process(request):
-    if request.method == "POST" and request.FILES.get('marks_file'):
-        try:
-            file = request.FILES['marks_file']
-            if file.name.endswith('.xlsx'):
-                df = pd.read_excel(file, engine='openpyxl')
-            else:
-                df = pd.read_csv(file)
-        except Exception as e:
-            logger.error(f"File upload error: {e}")
-            return render(request, 'keam_app/results.html', {
-                'errors': ["Unable to process uploaded file. Please check the format."]
-            })
+async def _iter_in_thread(iterator, batch=ASYNC_STREAM_BATCH):
+    """Drive a blocking iterator from the event loop, a batch per worker hop"""
+    take = sync_to_async(lambda: list(itertools.islice(iterator, batch)))
+    while True:
+        chunks = await take()
+        if not chunks:
+            return
+        for chunk in chunks:
+            yield chunk
 
-        df.columns = df.columns.str.strip()
-        year_id = request.session.get('year_id')
-        if not year_id:
-            return redirect('keam_app:intro')
 
-        try:
-            year = Year.objects.get(id=year_id)
-        except Year.DoesNotExist:
-            return redirect('keam_app:intro')
-
-        kerala_board, created = Board.objects.get_or_create(
-            name="Kerala HSE",
-            year=year,
-            defaults={'name': "Kerala HSE", 'year': year}
-        )
-        if created:
-            logger.warning(f"Created new Kerala HSE board for year {year}")
+def _stream_export(request, year, upload, export_format, ranked=False):
+    """Stream normalized rows as a CSV/XLSX download while they are computed.
 
-        kerala_stats = {}
-        for view_subject in ['maths', 'physics', 'chemistry']:
-            db_subject = get_db_subject_name(view_subject)
-            stat = SubjectStat.objects.filter(
-                board=kerala_board,
-                subject__iexact=db_subject
-            ).first()
-            kerala_stats[view_subject] = (stat.mean, stat.sd) if stat else (70.0, 10.0)
-
-        scaling_factors = {'maths': 1.5, 'physics': 0.9, 'chemistry': 0.6}  # KEAM 2025 scaling
-        results = []
-        errors = []
-
-        for index, row in df.iterrows():
-            try:
-                board_name = str(row.get('Board', '')).strip()
-                if not board_name:
-                    errors.append(f"Row {index + 2}: Missing board name")
-                    continue
-
-                try:
-                    entrance = float(row.get('Entrance', 0))
-                except (ValueError, TypeError):
-                    entrance = 0
-
-                marks = {}
-                for view_subject in ['maths', 'physics', 'chemistry']:
-                    col_name = view_subject.capitalize()
-                    mark_value = row.get(col_name) or row.get(view_subject) or row.get(view_subject.upper()) or 0
-                    try:
-                        marks[view_subject] = float(mark_value)
-                    except (ValueError, TypeError):
-                        marks[view_subject] = 0
-
-                board_obj, _ = Board.objects.get_or_create(
-                    name=board_name,
-                    year=year,
-                    defaults={'name': board_name, 'year': year}
-                )
-
-                scaled_total = 0
-                subject_results = {}
-                row_errors = []
-
-                for view_subject, mark in marks.items():
-                    db_subject = get_db_subject_name(view_subject)
-                    stat = SubjectStat.objects.filter(
-                        board=board_obj,
-                        subject__iexact=db_subject
-                    ).first()
-
-                    if not stat:
-                        row_errors.append(f"No stats for {view_subject}")
-                        stat_mean, stat_sd = 70.0, 10.0
-                    else:
-                        stat_mean, stat_sd = stat.mean, stat.sd
-
-                    mean_kerala, sd_kerala = kerala_stats[view_subject]
-                    norm_data = normalize_mark(mark, stat_mean, stat_sd, mean_kerala, sd_kerala)
-
-                    if 'error' in norm_data:
-                        row_errors.append(f"Normalization failed for {view_subject}")
-
-                    subject_results[view_subject] = norm_data
-                    scaled_total += norm_data["normalized_mark"] * scaling_factors[view_subject]
-
-                final_score = round(scaled_total + entrance, 4)  # Modify if KEAM uses (scaled_total + entrance)/2
-
-                results.append({
-                    'board': board_name,
-                    'marks': marks,
-                    'entrance': entrance,
-                    'scaled_total': scaled_total,
-                    'final_score': final_score,
-                    'subject_results': subject_results,
-                    'errors': row_errors
-                })
-
-                if row_errors:
-                    errors.append(f"Row {index + 2}: " + ", ".join(row_errors))
-
-            except Exception as e:
-                errors.append(f"Row {index + 2}: Error processing - {str(e)}")
-                continue
-
-        return render(request, 'keam_app/bulk_results.html', {
-            'results': results,
-            'errors': errors
+    With ``ranked`` the whole cohort is normalized before the first byte is
+    sent, since every row's rank depends on every other row. Under ASGI the
+    export is handed over as an async iterator; Django would otherwise read
+    a blocking one to the end before sending anything.
+    """
+    rows = normalize_mark_sheet(read_mark_sheet(upload), year)
+    try:
+        # Surface unreadable files before the response has started
+        if ranked:
+            rows, _ = rank_rows(rows)
+            rows = iter(rows)
+        first_row = next(rows, None)
+    except Exception as e:
+        logger.error(f"File upload error: {e}")
+        return render(request, 'keam_app/results.html', {
+            'errors': ["Unable to process uploaded file. Please check the format."]
         })
 
-    return redirect('keam_app:marks_form')
+    if first_row is not None:
+        rows = itertools.chain([first_row], rows)
 
+    content = iter_export(rows, export_format, ranked)
+    if isinstance(request, ASGIRequest):
+        content = _iter_in_thread(content)
 
-def marks_form(request):
-    """Display the marks entry form"""
-    year_id = request.session.get('year_id')
-    if not year_id:
+    content_type, filename = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _process_upload(request, year, upload):
+    """Normalize and rank a whole mark sheet for the on-page results"""
+    results = []
+    errors = []
+    unknown_boards = UnknownBoards()
+
+    try:
+        chunks = read_mark_sheet(upload)
+        rows, cohort = rank_rows(normalize_mark_sheet(chunks, year, unknown_boards))
+        for row_number, row_result, row_errors in rows:
+            if row_result is not None:
+                results.append(row_result)
+            if row_errors:
+                errors.append(f"Row {row_number}: " + ", ".join(row_errors))
+    except Exception as e:
+        logger.error(f"File upload error: {e}")
+        return render(request, 'keam_app/results.html', {
+            'errors': ["Unable to process uploaded file. Please check the format."]
+        })
+
+    return render(request, 'keam_app/bulk_results.html', {
+        'results': results,
+        'errors': errors,
+        'unknown_boards': unknown_boards.summary(),
+        'cohort_size': len(cohort)
+    })
+
+
+@csrf_exempt
+@migrates_year_selection
+async def upload_and_process(request):
+    if request.method != "POST":
+        return redirect('keam_app:marks_form')
+
+    # Parsing the multipart body spools the upload to disk
+    upload = await sync_to_async(lambda: request.FILES.get('marks_file'))()
+    if not upload:
+        return redirect('keam_app:marks_form')
+
+    year = await _selected_year(request)
+    if year is None:
         return redirect('keam_app:intro')
 
+    export_format = request.POST.get('format', '').lower()
+    if export_format in EXPORT_FORMATS:
+        return await sync_to_async(_stream_export)(
+            request, year, upload, export_format, bool(request.POST.get('rank'))
+        )
+    return await sync_to_async(_process_upload)(request, year, upload)
+
+
+@csrf_exempt
+def submit_upload_job(request):
+    """Queue a mark sheet for background normalization and return its job ID"""
+    if request.method != 'POST' or not request.FILES.get('marks_file'):
+        return JsonResponse({'error': 'POST a marks_file'}, status=400)
+
+    year_id = selected_year_id(request) or request.POST.get('year')
     try:
         year = Year.objects.get(id=year_id)
-    except Year.DoesNotExist:
+    except (Year.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({'error': 'Select a valid year first'}, status=400)
+
+    job = submit_bulk_job(year, request.FILES['marks_file'], request.POST.get('format', 'csv').lower())
+    return JsonResponse({
+        'job_id': str(job.id),
+        'status': job.status,
+        'progress_url': reverse('keam_app:job_progress', args=[job.id]),
+        'download_url': reverse('keam_app:job_download', args=[job.id]),
+        'rank_url': reverse('keam_app:job_rank', args=[job.id]),
+    }, status=202)
+
+
+def _get_job(job_id):
+    try:
+        return BulkJob.objects.get(id=job_id)
+    except BulkJob.DoesNotExist:
+        raise Http404("Unknown job")
+
+
+def upload_job_progress(request, job_id):
+    return JsonResponse(job_progress(_get_job(job_id)))
+
+
+def upload_job_download(request, job_id):
+    job = _get_job(job_id)
+    if job.status != BulkJob.DONE:
+        return JsonResponse(job_progress(job), status=409)
+
+    content_type, filename = EXPORT_FORMATS[job.export_format]
+    return FileResponse(
+        job.result_file.open('rb'), as_attachment=True, filename=filename, content_type=content_type
+    )
+
+
+def upload_job_rank(request, job_id):
+    """Where a final score would rank in a finished job's cohort"""
+    job = _get_job(job_id)
+    try:
+        score = float(request.GET['score'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Pass a numeric score'}, status=400)
+    if score != score or score in (float('inf'), float('-inf')):
+        return JsonResponse({'error': 'Pass a numeric score'}, status=400)
+
+    cohort = job_cohort(job)
+    if cohort is None:
+        return JsonResponse(job_progress(job), status=409)
+    return JsonResponse(cohort.rank_of(score))
+
+
+@public_reads
+@migrates_year_selection
+async def marks_form(request):
+    """Display the marks entry form"""
+    year = await _selected_year(request)
+    if year is None:
         return redirect('keam_app:intro')
 
     if request.method == 'POST':
         form = MarkEntryForm(request.POST, year=year)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             return redirect('keam_app:result')
-    else:
-        form = MarkEntryForm(year=year)
+        return await _render(request, 'keam_app/form.html', {
+            'form': form,
+            'year': year
+        })
 
-    return render(request, 'keam_app/form.html', {
+    # The page only changes with the year's boards and stats
+    stats_index = await sync_to_async(get_stats_index)(year)
+    page_version = f"form-{year.pk}-{stats_index.version}"
+    not_modified = _not_modified(request, page_version)
+    if not_modified is not None:
+        return not_modified
+
+    form = MarkEntryForm(year=year)
+    board_select = await sync_to_async(_cached_fragment)(
+        f"keam:fragment:boards:{year.pk}:{stats_index.version}", lambda: str(form['board'])
+    )
+    response = await _render(request, 'keam_app/form.html', {
         'form': form,
-        'year': year
+        'year': year,
+        'board_select': board_select
     })
+    return _with_etag(request, response, page_version)
+
+
+def stats_cache_metrics(request):
+    """Expose the stats and result cache counters of this worker"""
+    return JsonResponse({**stats_cache_info(), 'result_cache': get_result_cache().info()})
 
 
 @csrf_exempt
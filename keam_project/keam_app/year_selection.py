@@ -0,0 +1,86 @@
+import functools
+
+from django.conf import settings
+from django.core.signing import BadSignature
+
+YEAR_COOKIE_NAME = 'keam_year'
+_YEAR_COOKIE_SALT = 'keam_app.year_selection'
+
+COOKIE = 'cookie'
+SESSION = 'session'
+
+DEFAULT_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
+
+
+def selection_mode():
+    """Where the public flow keeps the selected year: 'cookie' or 'session'"""
+    return getattr(settings, 'KEAM_YEAR_SELECTION', COOKIE)
+
+
+def _cookie_age():
+    return getattr(settings, 'KEAM_YEAR_COOKIE_AGE', DEFAULT_COOKIE_AGE)
+
+
+def remember_year(request, response, year_id):
+    """Record the selected year on the response (cookie mode) or the session"""
+    if selection_mode() == SESSION:
+        request.session['year_id'] = year_id
+        return
+    response.set_signed_cookie(
+        YEAR_COOKIE_NAME, str(year_id), salt=_YEAR_COOKIE_SALT, max_age=_cookie_age(),
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def _cookie_year_id(request):
+    try:
+        return request.get_signed_cookie(YEAR_COOKIE_NAME, salt=_YEAR_COOKIE_SALT, max_age=_cookie_age())
+    except (KeyError, BadSignature):
+        return None
+
+
+def selected_year_id(request):
+    """The selected year ID, or None.
+
+    In cookie mode a visitor who picked a year before the switch still has
+    it in their DB session; that is read once and re-issued as a cookie by
+    ``migrates_year_selection``.
+    """
+    if selection_mode() == COOKIE:
+        year_id = _cookie_year_id(request)
+        if year_id is not None:
+            return year_id
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return None
+        year_id = request.session.get('year_id')
+        request.legacy_year_id = year_id
+        return year_id
+    return request.session.get('year_id')
+
+
+async def aselected_year_id(request):
+    """selected_year_id for async views"""
+    if selection_mode() == COOKIE:
+        year_id = _cookie_year_id(request)
+        if year_id is not None:
+            return year_id
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return None
+        year_id = await request.session.aget('year_id')
+        request.legacy_year_id = year_id
+        return year_id
+    return await request.session.aget('year_id')
+
+
+def migrates_year_selection(view):
+    """Move a year found in a legacy session into the year cookie"""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await view(request, *args, **kwargs)
+        legacy_year_id = getattr(request, 'legacy_year_id', None)
+        if legacy_year_id:
+            remember_year(request, response, legacy_year_id)
+        return response
+
+    return wrapper
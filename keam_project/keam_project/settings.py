@@ -1,5 +1,6 @@
 
 
+import os
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-)u_gztymqfpwpust8s$kf=$*25c@%)@gfo*9)s8g-s+$*#@3kh'
@@ -29,6 +30,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'keam_app.instrumentation.InstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'keam_project.urls'
@@ -54,13 +56,102 @@ WSGI_APPLICATION = 'keam_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are set up by keam_app.db.configure_sqlite (WAL, mmap, busy
+# timeout; see DEFAULT_SQLITE_PRAGMAS there). Public pages read through
+# 'readonly', a query_only connection to the same file, so admin imports
+# never block them.
+#
+# Persistent connections (KEAM_CONN_MAX_AGE seconds) only help under WSGI.
+# Under ASGI every sync_to_async call may land on a different worker thread
+# with its own connection, and those are never closed by request_finished,
+# so keep the default of 0 there.
+
+KEAM_CONN_MAX_AGE = int(os.environ.get('KEAM_CONN_MAX_AGE', 0))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': KEAM_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'readonly': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': KEAM_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['keam_app.db.PublicReadRouter']
+KEAM_READ_DATABASE = 'readonly'
+
+
+# Cache
+# Local memory by default; point 'default' (or KEAM_STATS_CACHE_ALIAS) at a
+# shared backend such as Redis or Memcached to share stats between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'keam-stats',
     }
 }
 
+KEAM_STATS_CACHE_ALIAS = 'default'
+# Signals invalidate the cache of the process that saved the change; with the
+# per-process locmem cache other workers only see it once their entry expires.
+# With a shared backend this can be raised (None: until stats change).
+KEAM_STATS_CACHE_TIMEOUT = 60  # seconds
+
+# Per-process LRU of computed single-student results (size 0 disables it)
+KEAM_RESULT_CACHE_SIZE = 10000
+KEAM_RESULT_CACHE_TTL = 600  # seconds
+
+# Where the public flow keeps the selected year: 'cookie' (a signed cookie, no
+# DB writes) or 'session'. In cookie mode a year found in an older DB session
+# is still honoured and moved into the cookie on the visitor's next page.
+KEAM_YEAR_SELECTION = 'cookie'
+KEAM_YEAR_COOKIE_AGE = 60 * 60 * 24 * 30  # seconds
+
+# Memory-mapped export of every year's stats (manage.py export_stats_snapshot),
+# read on stats cache misses instead of the database for years whose
+# stats_generation has not moved since the export
+KEAM_STATS_SNAPSHOT = os.path.join(BASE_DIR, 'media', 'stats_snapshot.bin')
+
+# Where admin-precomputed normalized marks over the 0-100 mark grid are kept
+# (None turns them off; marks are then always normalized exactly). A year
+# without a grid is looked for again every KEAM_MARK_GRID_RECHECK_INTERVAL s.
+KEAM_MARK_GRID_DIR = os.path.join(BASE_DIR, 'media', 'mark_grids')
+KEAM_MARK_GRID_RECHECK_INTERVAL = 60
+
+# Rows per chunk when streaming uploaded mark sheets
+KEAM_UPLOAD_CHUNK_SIZE = 5000
+
+# Worker processes for bulk normalization (1 keeps it in-process) and the
+# smallest chunk, in rows, that is split across them
+KEAM_NORMALIZE_WORKERS = 1
+KEAM_PARALLEL_MIN_ROWS = 50000
+
+# Rows between progress writes of a queued bulk job
+KEAM_JOB_PROGRESS_EVERY = 1000
+
+# A job running longer than this (seconds) is taken to be orphaned by a dead
+# worker and is claimed again; finished jobs and their files are deleted by
+# process_bulk_jobs once they are older than the retention
+KEAM_JOB_TIMEOUT = 60 * 60
+KEAM_JOB_RETENTION = 60 * 60 * 24 * 7
+
+# Largest student array accepted by /api/normalize/batch/
+KEAM_API_MAX_BATCH = 10000
+
+# Max absolute error of the interpolated normal CDF used for percentiles
+KEAM_PERCENTILE_TOLERANCE = 1e-9
+
+# Server-Timing headers and Prometheus metrics at /metrics/ (off: no overhead)
+KEAM_INSTRUMENTATION = os.environ.get('KEAM_INSTRUMENTATION') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -97,13 +188,16 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
-import os
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Uploaded mark sheets and results of queued bulk jobs
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 TEMPLATES[0]['DIRS'] = [os.path.join(BASE_DIR, 'templates')]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'